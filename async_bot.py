@@ -0,0 +1,252 @@
+import os
+import asyncio
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+from functions.async_clients import get_http_session, get_openai_client, close_clients
+from functions.news import fetch_latest_news, fetch_news_since, news_store
+from functions.digest import NewsDigest
+from functions.search import perform_internet_search_async, search_and_summarize_async
+from functions.weather import get_sea_water_temperature_async, get_air_temperature_async
+from functions.openai_wrappers import _get_completion_async, _stream_completion_async
+from functions.streaming import AsyncStreamingReply
+from functions.router import intent_router
+from functions.fanout import Source, fan_out_async
+from functions.jobs import AsyncJobScheduler, JobRejected
+from functions.metrics import TIME_TO_FIRST_TOKEN, track_handler, track_stage, track_upstream, start_metrics_server
+from paphos_bot import (
+    logger, BING_API_KEY, TELEGRAM_TOKEN, TELEGRAM_API_URL, WEATHER_API_KEY, WELCOME_TEXT, GENERATION_FAILED_TEXT, QUEUED_TEXT, STREAM_REPLIES,
+    GENERAL_LLM_DEADLINE, GENERAL_SEARCH_DEADLINE, GENERAL_NEWS_DEADLINE,
+    response_cache, knowledge_base,
+    build_prompt, report_system_time, execute_allowed_command, with_city,
+    format_news, format_news_since, subscribe_news, unsubscribe_news, format_search_summary, format_search_links, format_general, general_llm_response, rejected_text,
+)
+from utils import log_user_action, preview
+
+# Сколько сообщений может обрабатываться одновременно (без учета ожидания в планировщике тяжелых задач)
+MAX_CONCURRENT_HANDLERS = int(os.getenv('MAX_CONCURRENT_HANDLERS', 50))
+# Намерения, основная работа которых выполняется в планировщике: его очередь и так ограничена,
+# поэтому слот обработчика берется только вокруг остальных запросов
+SCHEDULED_INTENTS = ('general', 'search and summarize')
+
+# Инициализация асинхронного бота
+if TELEGRAM_API_URL:
+    asyncio_helper.API_URL = TELEGRAM_API_URL
+bot = AsyncTeleBot(TELEGRAM_TOKEN)
+handler_slots = asyncio.Semaphore(MAX_CONCURRENT_HANDLERS)
+job_scheduler = AsyncJobScheduler()
+
+
+async def generate_response_async(user_input, context):
+    """
+    Асинхронная генерация ответа с использованием общего клиента AsyncOpenAI.
+    """
+    try:
+        response = await _get_completion_async(get_openai_client(), build_prompt(user_input, context))
+        return response.strip()
+    except Exception as e:
+        print(f"Ошибка при генерации ответа: {e}")
+        return GENERATION_FAILED_TEXT
+
+
+async def generate_response_stream_async(user_input, context, reply):
+    """
+    Асинхронная версия generate_response_stream.
+    """
+    try:
+        async for delta in _stream_completion_async(get_openai_client(), build_prompt(user_input, context)):
+            await reply.push(delta)
+        return reply.text.strip() or GENERATION_FAILED_TEXT
+    except Exception as e:
+        print(f"Ошибка при генерации ответа: {e}")
+        return GENERATION_FAILED_TEXT
+
+
+async def answer_general_question_async(user_input, reply=None, user_id=None, on_queued=None):
+    """
+    Асинхронная версия paphos_bot.submit_general_question; возвращает сам ответ
+    (ожидание задачи в asyncio не занимает потоков).
+
+    :param on_queued: Корутина-функция, вызываемая с позицией, если задача попала в очередь.
+    """
+    llm_response = response_cache.get(user_input)
+    if llm_response is None:
+        with track_stage('knowledge_base'):
+            context = knowledge_base.search(user_input)
+        if reply is not None:
+            generate = lambda: generate_response_stream_async(user_input, context, reply)
+        else:
+            generate = lambda: generate_response_async(user_input, context)
+        try:
+            job = await job_scheduler.submit(user_id, generate)
+        except JobRejected as e:
+            return rejected_text(e)
+        if job.position and on_queued is not None:
+            await on_queued(job.position)
+
+        def cache_response(done):
+            # Ответ кэшируется, даже если он пришел уже после дедлайна
+            if not done.cancelled() and done.exception() is None and done.result() != GENERATION_FAILED_TEXT:
+                response_cache.set(user_input, done.result())
+
+        job.future.add_done_callback(cache_response)
+        # При дедлайне fan_out_async отменяет только ожидание: задача доработает и ответ попадет в кэш
+        llm_response = await asyncio.shield(job.future)
+    return llm_response
+
+
+async def in_handler_slot(call):
+    """
+    Выполняет call() (возвращает корутину), заняв один из слотов обработки сообщений.
+    """
+    async with handler_slots:
+        return await call()
+
+
+def queued_notifier(message, reply=None):
+    """
+    Асинхронная версия paphos_bot.queued_notifier.
+    """
+    async def notify(position):
+        text = QUEUED_TEXT.format(position=position)
+        if reply is not None:
+            await reply.status(text)
+        else:
+            with track_upstream('telegram'):
+                await bot.reply_to(message, text)
+    return notify
+
+
+async def build_response(intent, argument, user_id, text, reply=None, on_queued=None, chat_id=None):
+    """
+    Построение ответа для заданного намерения. Сетевые вызовы выполняются
+    через общий пул aiohttp/AsyncOpenAI, остальные — в пуле потоков.
+
+    :param reply: AsyncStreamingReply для потокового показа ответа LLM (необязательно).
+    :param on_queued: Корутина-функция, сообщающая пользователю позицию тяжелой задачи в очереди.
+    :param chat_id: Чат для подписки на дайджест (по умолчанию user_id — личный чат).
+    """
+    session = get_http_session()
+
+    if intent == 'time':
+        return report_system_time()
+
+    elif intent == 'sea temperature':
+        return await get_sea_water_temperature_async(WEATHER_API_KEY, session)
+
+    elif intent == 'air temperature':
+        return await get_air_temperature_async(WEATHER_API_KEY, session)
+
+    elif intent == 'execute command':
+        return await asyncio.to_thread(execute_allowed_command, argument)
+
+    elif intent == 'news':
+        latest_news = await asyncio.to_thread(fetch_latest_news, user_id)
+        return format_news(latest_news)
+
+    elif intent == 'news since last read':
+        return format_news_since(await asyncio.to_thread(fetch_news_since, user_id))
+
+    elif intent == 'news subscribe':
+        return await asyncio.to_thread(subscribe_news, chat_id or user_id)
+
+    elif intent == 'news unsubscribe':
+        return await asyncio.to_thread(unsubscribe_news, chat_id or user_id)
+
+    elif intent == 'search and summarize':
+        text_for_search = with_city(argument)
+        try:
+            job = await job_scheduler.submit(
+                user_id, lambda: search_and_summarize_async(text_for_search, BING_API_KEY, get_openai_client(), session)
+            )
+        except JobRejected as e:
+            return rejected_text(e)
+        if job.position and on_queued is not None:
+            await on_queued(job.position)
+        try:
+            search_sum_results = await job.future
+        except Exception:
+            search_sum_results = None
+        return format_search_summary(search_sum_results)
+
+    elif intent == 'search':
+        text_for_search = with_city(argument)
+        search_links = await perform_internet_search_async(text_for_search, BING_API_KEY, session)
+        return format_search_links(search_links)
+
+    # Общий запрос о Пафосе: LLM, поиск и новости запрашиваются одновременно;
+    # слот обработчика занимают только поиск и новости, LLM ждет в планировщике
+    results = await fan_out_async([
+        Source('llm', lambda: answer_general_question_async(text, reply, user_id, on_queued), GENERAL_LLM_DEADLINE),
+        Source('search', lambda: in_handler_slot(
+            lambda: perform_internet_search_async(with_city(text), BING_API_KEY, session)
+        ), GENERAL_SEARCH_DEADLINE, []),
+        Source('news', lambda: in_handler_slot(
+            lambda: asyncio.to_thread(fetch_latest_news, user_id, advance=False)
+        ), GENERAL_NEWS_DEADLINE, []),
+    ])
+    llm_response = general_llm_response(results, reply)
+    if reply is not None and reply.time_to_first_token is not None:
+        TIME_TO_FIRST_TOKEN.observe(reply.time_to_first_token)
+        log_user_action(logger, user_id, action_description=f"time to first token: {reply.time_to_first_token:.2f}s")
+    return format_general(llm_response, results['search'], results['news'])
+
+
+@bot.message_handler(commands=['start', 'help'])
+async def send_welcome(message):
+    await bot.reply_to(message, WELCOME_TEXT)
+
+
+@bot.message_handler(func=lambda message: True)
+async def handle_message(message):
+    user_id = message.from_user.id
+    user_input = message.text.strip().lower()
+    log_user_action(logger, user_id, action_description=f"got user message: {user_input}")
+
+    intent, argument = intent_router.route(user_input)
+    log_user_action(logger, user_id, action_description=f"handling user message: {intent}")
+
+    reply = None
+    with track_handler(intent):
+        if intent == 'exit':
+            with track_upstream('telegram'):
+                await bot.reply_to(message, "До свидания!")
+            return
+
+        if intent == 'general' and STREAM_REPLIES:
+            reply = AsyncStreamingReply(bot, message)
+            await reply.start()
+        build = lambda: build_response(
+            intent, argument, user_id, message.text, reply, queued_notifier(message, reply), message.chat.id
+        )
+        # Ожидание в очереди тяжелых задач не должно занимать слоты легких намерений (время, погода, новости)
+        response = await (build() if intent in SCHEDULED_INTENTS else in_handler_slot(build))
+
+        log_user_action(logger, user_id, action_description="responding to user: " + preview(response))
+        if reply is not None:
+            await reply.finish(response)
+        else:
+            with track_upstream('telegram'):
+                await bot.reply_to(message, response)
+
+
+async def main():
+    print("Бот запущен и работает (asyncio)...")
+    log_user_action(logger, user_id=None, action_description="Async bot started and running.")
+    news_store.start()
+    # Рассылка дайджеста идет в своем потоке, сообщения отправляются через цикл событий бота
+    loop = asyncio.get_running_loop()
+    news_digest = NewsDigest(
+        send=lambda chat_id, text: asyncio.run_coroutine_threadsafe(bot.send_message(chat_id, text), loop).result()
+    )
+    news_digest.start()
+    start_metrics_server()
+    try:
+        await bot.infinity_polling()
+    finally:
+        await asyncio.to_thread(news_digest.stop)
+        news_store.stop()
+        await job_scheduler.close()
+        await close_clients()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""
+Бенчмарк подготовки контекста для LLM в зависимости от размера базы знаний.
+
+Сравнивает прежний способ (чтение data.json и json.dumps всего файла на каждый
+вопрос) с KnowledgeBase (индекс строится один раз, в запрос идут top-k фрагментов).
+Размер контекста оценивается в символах и примерно в токенах (символы / 4).
+
+Запуск: python benchmarks/bench_knowledge_base.py
+"""
+import os
+import sys
+import json
+import random
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.knowledge_base import KnowledgeBase
+
+KB_SIZES = [10, 100, 1000, 10000]
+QUESTIONS = [
+    "best sandy beaches near paphos",
+    "где поесть рыбу у гавани",
+    "bus from the airport to kato paphos",
+    "what to see in the archaeological park",
+]
+AREAS = ["Kato Paphos", "Harbour", "Coral Bay", "Peyia", "Geroskipou", "Old Town"]
+WORDS = ["fish", "meze", "sandy", "quiet", "family", "sunset", "view", "cheap", "local", "wine", "pebble", "snorkeling"]
+
+
+def synthetic_data(size, seed=7):
+    rng = random.Random(seed)
+    restaurants = [
+        {"name": f"Taverna {index}", "area": rng.choice(AREAS), "notes": ' '.join(rng.choices(WORDS, k=8))}
+        for index in range(size // 2)
+    ]
+    beaches = [
+        {"name": f"Beach {index}", "area": rng.choice(AREAS), "notes": ' '.join(rng.choices(WORDS, k=8))}
+        for index in range(size // 4)
+    ]
+    buses = [f"Route {index}: Airport - {rng.choice(AREAS)}" for index in range(size - len(restaurants) - len(beaches))]
+    return {"restaurants": restaurants, "beaches": beaches, "bus_routes": buses}
+
+
+def measure(func, number=20):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main():
+    print(f"{'entries':>8} {'dump, chars':>12} {'dump, ms':>9} {'kb, chars':>10} {'kb, ms':>7} {'index, ms':>10}")
+    for size in KB_SIZES:
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as f:
+            json.dump(synthetic_data(size), f, ensure_ascii=False)
+            path = f.name
+        try:
+            def dump_context():
+                # Прежнее поведение: загрузка и сериализация всего файла на каждый вопрос
+                contexts = []
+                for _ in QUESTIONS:
+                    with open(path, 'r', encoding='utf-8') as data_file:
+                        contexts.append(json.dumps(json.load(data_file), ensure_ascii=False))
+                return contexts
+
+            index_ms = measure(lambda: KnowledgeBase(path), number=3)
+            kb = KnowledgeBase(path, full_context_chars=0)
+
+            def kb_context():
+                return ['\n'.join(kb.search(question)) for question in QUESTIONS]
+
+            dump_chars = sum(len(context) for context in dump_context()) // len(QUESTIONS)
+            kb_chars = sum(len(context) for context in kb_context()) // len(QUESTIONS)
+            dump_ms = measure(dump_context) / len(QUESTIONS)
+            kb_ms = measure(kb_context) / len(QUESTIONS)
+            print(f"{size:>8} {dump_chars:>12} {dump_ms:>9.3f} {kb_chars:>10} {kb_ms:>7.3f} {index_ms:>10.1f}")
+        finally:
+            os.unlink(path)
+    print("Примерный размер в токенах: символы / 4.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Бенчмарк выдачи новостей в зависимости от размера хранилища.
+
+Сравнивает полный проход по снимку с форматированием каждой записи на
+каждый запрос (прежний способ) с запросом "что нового" (NewsStore.added_after:
+бинарный поиск по индексу порядка появления, уже отформатированные записи)
+и стоимость подготовки одного дайджеста.
+
+Запуск: python benchmarks/bench_news.py
+"""
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.news import NewsStore, fetch_news_since
+from functions.sessions import MemorySessionStore
+from functions.digest import render_digest
+
+STORE_SIZES = [100, 1000, 10000]
+NEW_ENTRIES = 5  # новостей, появившихся с прошлого запроса пользователя
+
+
+class FakeEntry(dict):
+    __getattr__ = dict.__getitem__
+
+
+def filled_store(size):
+    now = time.time()
+    store = NewsStore(feeds=[], max_entries=size)
+    # Как при первой загрузке ленты: записи "появились" в момент публикации
+    store._merge(
+        store._parse_entry(FakeEntry(
+            title=f"Новость {index}", link=f"https://example.com/news/{index}",
+            published_parsed=time.gmtime(now - (size - index) * 60),
+        ), first_load=True)
+        for index in range(size)
+    )
+    store._loaded.set()
+    return store
+
+
+def measure(func, number=200):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1000
+
+
+def main():
+    print(f"{'entries':>8} {'scan, ms':>9} {'since, ms':>10} {'digest, ms':>11}")
+    for size in STORE_SIZES:
+        store = filled_store(size)
+        arrivals = store.added_after(None)
+        seen = store.arrival_cursor(arrivals[-NEW_ENTRIES - 1])
+        sessions = MemorySessionStore()
+
+        def scan():
+            # Прежнее поведение: проход по всему снимку и форматирование на каждый запрос
+            return [
+                f"**{entry.title}**\n[Читать далее]({entry.link})\n"
+                for entry in store.snapshot() if [entry.added, entry.key] > seen
+            ]
+
+        def since():
+            sessions.set(1, 'news_seen', seen)
+            return fetch_news_since(1, sessions, store=store)
+
+        def digest():
+            return render_digest(store.added_after(seen)[::-1])
+
+        print(f"{size:>8} {measure(scan):>9.3f} {measure(since):>10.3f} {measure(digest):>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
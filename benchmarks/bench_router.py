@@ -0,0 +1,82 @@
+"""
+Микро-бенчмарк маршрутизации сообщений.
+
+Сравнивает IntentRouter (один автомат на все триггеры) с цепочкой проверок
+подстрок, как было в handle_message, по мере добавления синтетических намерений.
+
+Запуск: python benchmarks/bench_router.py
+"""
+import os
+import sys
+import random
+import string
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from functions.router import INTENTS, Intent, IntentRouter
+
+MESSAGES = [
+    "какое сейчас время",
+    "температура моря в пафосе",
+    "найди и саммаризуй лучшие пляжи",
+    "найди рестораны у гавани",
+    "новости",
+    "что посмотреть в пафосе за один день?",
+    "where can i rent a car near the harbour",
+]
+INTENT_COUNTS = [0, 10, 100, 1000, 5000]
+REPEAT = 2000
+# Цепочка проверок растет линейно с числом намерений: для больших наборов
+# число повторов уменьшается, чтобы бенчмарк укладывался в секунды
+REPEAT_INTENTS = 20
+MIN_REPEAT = 10
+
+
+def synthetic_intents(count, seed=42):
+    rng = random.Random(seed)
+    intents = []
+    for index in range(count):
+        triggers = [''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12))) for _ in range(3)]
+        intents.append(Intent(f'synthetic {index}', priority=index % 20, triggers=triggers))
+    return intents
+
+
+def substring_chain(intents):
+    # Эквивалент цепочки elif: проверяем намерения по очереди до первого совпадения
+    ordered = sorted(intents, key=lambda intent: -intent.priority)
+
+    def route(text):
+        for intent in ordered:
+            if text in intent.exact:
+                return intent.name
+            for trigger in intent.triggers:
+                if all(term in text for term in trigger):
+                    return intent.name
+        return 'general'
+    return route
+
+
+def repeat_for(intents):
+    return max(MIN_REPEAT, min(REPEAT, REPEAT * REPEAT_INTENTS // len(intents)))
+
+
+def measure(route, number):
+    def run():
+        for message in MESSAGES:
+            route(message)
+    seconds = min(timeit.repeat(run, number=number, repeat=3))
+    return seconds / (number * len(MESSAGES)) * 1e6
+
+
+def main():
+    print(f"{'intents':>8} {'router, us/msg':>16} {'substring chain, us/msg':>24}")
+    for count in INTENT_COUNTS:
+        intents = INTENTS + synthetic_intents(count)
+        router = IntentRouter(intents)
+        number = repeat_for(intents)
+        print(f"{len(intents):>8} {measure(router.route, number):>16.2f} {measure(substring_chain(intents), number):>24.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Бенчмарк холодного старта бота: время импорта модуля и время до первого
+опроса Telegram (getUpdates) в новом процессе. Внешние сервисы заменяются
+заглушками из stubs.py.
+
+Самые тяжелые импорты берутся из python -X importtime. Пороги
+--max-import-ms и --max-first-poll-ms позволяют ловить регрессии
+(код возврата 1 при превышении медианы).
+
+Запуск:
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runtime async_bot --runs 10 --max-first-poll-ms 1500
+"""
+import os
+import sys
+import time
+import socket
+import argparse
+import statistics
+import threading
+import subprocess
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from stubs import make_stub_server, stub_urls
+
+FIRST_POLL_TIMEOUT = 60  # секунды
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def bot_env(port):
+    env = dict(os.environ)
+    env.update(stub_urls(port))
+    env.update({
+        'TELEGRAM_TOKEN': '123456:bench',
+        'OPENAI_API_KEY': 'bench',
+        'BING_API_KEY': 'bench',
+        'WEATHER_API_KEY': 'bench',
+        'METRICS_PORT': '0',
+        'PYTHONDONTWRITEBYTECODE': '1',
+    })
+    return env
+
+
+def measure_import(module, env):
+    """
+    :return: (время импорта модуля в мс, список (мс, имя) его прямых импортов от тяжелых к легким).
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Не удалось импортировать {module}:\n{result.stderr[-2000:]}")
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, raw_name = line[len('import time:'):].split('|')
+        # Вложенность видна только по отступу имени, поэтому он считается до strip()
+        depth = len(raw_name) - len(raw_name.lstrip())
+        imports.append((int(cumulative) / 1000, raw_name.strip(), depth))
+
+    # importtime печатает модуль после всех его импортов, каждый уровень вложенности —
+    # еще два пробела: прямые импорты — строки над ним с отступом на уровень глубже
+    index = next(index for index, (_, name, _) in enumerate(imports) if name == module)
+    total, _, module_depth = imports[index]
+    direct = []
+    for ms, name, depth in reversed(imports[:index]):
+        if depth <= module_depth:
+            break
+        if depth == module_depth + 2:
+            direct.append((ms, name))
+    direct.sort(reverse=True)
+    return total, direct
+
+
+def measure_first_poll(module, env, server):
+    """
+    Время от запуска процесса бота до первого запроса getUpdates, мс.
+    """
+    server.first_poll_at = None
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, f"{module}.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        while server.first_poll_at is None:
+            if process.poll() is not None:
+                raise RuntimeError(f"{module} завершился до первого опроса:\n{process.stderr.read()[-2000:]}")
+            if time.perf_counter() - started > FIRST_POLL_TIMEOUT:
+                raise RuntimeError(f"{module} не опросил Telegram за {FIRST_POLL_TIMEOUT} с")
+            time.sleep(0.005)
+        return (server.first_poll_at - started) * 1000
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Время импорта и холодного старта бота")
+    parser.add_argument('--runtime', choices=['paphos_bot', 'async_bot'], default='paphos_bot')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="сколько самых тяжелых импортов показать")
+    parser.add_argument('--max-import-ms', type=float, help="порог медианы времени импорта")
+    parser.add_argument('--max-first-poll-ms', type=float, help="порог медианы времени до первого опроса")
+    args = parser.parse_args()
+
+    port = free_port()
+    server = make_stub_server(port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = bot_env(port)
+
+    import_times, heaviest = [], []
+    for _ in range(args.runs):
+        total, heaviest = measure_import(args.runtime, env)
+        import_times.append(total)
+    poll_times = [measure_first_poll(args.runtime, env, server) for _ in range(args.runs)]
+    server.shutdown()
+
+    import_ms = statistics.median(import_times)
+    first_poll_ms = statistics.median(poll_times)
+    print(f"{args.runtime}: импорт {import_ms:.0f} мс (min {min(import_times):.0f}), "
+          f"до первого опроса {first_poll_ms:.0f} мс (min {min(poll_times):.0f}), запусков: {args.runs}")
+    print(f"\nСамые тяжелые прямые импорты {args.runtime} (последний запуск):")
+    for ms, name in heaviest[:args.top]:
+        print(f"{ms:>9.1f} мс  {name}")
+
+    failed = False
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        print(f"\nРЕГРЕССИЯ: импорт {import_ms:.0f} мс > {args.max_import_ms:.0f} мс")
+        failed = True
+    if args.max_first_poll_ms is not None and first_poll_ms > args.max_first_poll_ms:
+        print(f"\nРЕГРЕССИЯ: до первого опроса {first_poll_ms:.0f} мс > {args.max_first_poll_ms:.0f} мс")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
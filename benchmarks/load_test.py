@@ -0,0 +1,246 @@
+"""
+Нагрузочный тест обработчиков бота без доступа к сети.
+
+Внешние сервисы (Telegram, Bing, OpenWeatherMap, RSS, OpenAI) заменяются
+локальными заглушками из stubs.py, запущенными в отдельном процессе. Синтетическая
+смесь сообщений прогоняется через handle_message с заданной параллельностью.
+Отчет: сообщений в секунду, p50/p95/p99 задержки по намерениям, сбои внешних
+сервисов (после которых бот отвечает запасным текстом), пиковая память.
+
+Запуск:
+    python benchmarks/load_test.py --messages 500 --concurrency 20
+    python benchmarks/load_test.py --runtime async --latency openai=1.5 --errors bing=0.1
+"""
+import os
+import sys
+import math
+import time
+import random
+import socket
+import asyncio
+import argparse
+import resource
+import tracemalloc
+import multiprocessing
+from types import SimpleNamespace
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from stubs import serve_stubs, stub_urls, parse_service_values
+
+GENERAL_QUESTIONS = [
+    "что посмотреть в пафосе",
+    "лучшие пляжи пафоса",
+    "где попробовать местную кухню?",
+    "как добраться из аэропорта",
+    "what to see in paphos",
+    "best beaches near paphos",
+    "is the archaeological park worth visiting",
+    "куда сходить вечером",
+    "где взять машину в аренду",
+    "какие музеи есть в городе",
+]
+# (вес, варианты текста)
+MESSAGE_MIX = [
+    (40, GENERAL_QUESTIONS),
+    (15, ["новости", "news"]),
+    (15, ["найди пляжи", "найди рестораны у гавани", "search car rental"]),
+    (10, ["найди и саммаризуй лучшие пляжи", "search and summarize paphos castle"]),
+    (10, ["температура моря", "sea temperature"]),
+    (5, ["температура воздуха", "air temperature"]),
+    (5, ["время", "date"]),
+]
+USERS = 200
+
+
+def synthetic_messages(count, seed=1):
+    """
+    Сообщения Telegram с нужными обработчику полями.
+    """
+    rng = random.Random(seed)
+    weights = [weight for weight, _ in MESSAGE_MIX]
+    messages = []
+    for index in range(count):
+        _, texts = rng.choices(MESSAGE_MIX, weights=weights)[0]
+        user_id = rng.randint(1, USERS)
+        messages.append(SimpleNamespace(
+            text=rng.choice(texts),
+            message_id=index + 1,
+            from_user=SimpleNamespace(id=user_id),
+            chat=SimpleNamespace(id=user_id),
+        ))
+    return messages
+
+
+def percentile(values, percent):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_stubs(latency, error_rate):
+    context = multiprocessing.get_context('spawn')
+    port = free_port()
+    ready = context.Event()
+    process = context.Process(
+        target=serve_stubs, kwargs={'port': port, 'latency': latency, 'error_rate': error_rate, 'ready': ready},
+        daemon=True,
+    )
+    process.start()
+    if not ready.wait(timeout=10):
+        raise RuntimeError("Заглушки не запустились")
+    return process, port
+
+
+def replay_sync(messages, concurrency):
+    import paphos_bot
+
+    def run(message):
+        started = time.perf_counter()
+        try:
+            paphos_bot.handle_message(message)
+            return time.perf_counter() - started, None
+        except Exception as e:
+            return time.perf_counter() - started, e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(run, messages))
+
+
+async def replay_async(messages, concurrency):
+    import async_bot
+    from functions.async_clients import close_clients
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def run(message):
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await async_bot.handle_message(message)
+                return time.perf_counter() - started, None
+            except Exception as e:
+                return time.perf_counter() - started, e
+
+    try:
+        return await asyncio.gather(*(run(message) for message in messages))
+    finally:
+        # Прогрев и основной прогон идут в разных циклах событий
+        await async_bot.job_scheduler.close()
+        await close_clients()
+
+
+def replay(runtime, messages, concurrency):
+    if runtime == 'async':
+        return asyncio.run(replay_async(messages, concurrency))
+    return replay_sync(messages, concurrency)
+
+
+def failure_counters():
+    """
+    Текущие значения счетчиков сбоев: {(вид сбоя, сервис или причина): количество}.
+
+    Обработчики превращают сбои внешних сервисов в запасной текст, поэтому
+    деградация видна только по этим счетчикам, а не по исключениям.
+    """
+    from functions.metrics import UPSTREAM_ERRORS, JOBS_REJECTED
+    from functions.upstream import CIRCUIT_REJECTED
+
+    counters = {}
+    for kind, counter in (('upstream error', UPSTREAM_ERRORS), ('circuit rejected', CIRCUIT_REJECTED), ('job rejected', JOBS_REJECTED)):
+        for (label,), value in counter.values().items():
+            counters[(kind, label)] = value
+    return counters
+
+
+def report(messages, results, elapsed, trace_memory, failures=None):
+    from functions.router import intent_router
+
+    by_intent = {}
+    for message, (latency, error) in zip(messages, results):
+        intent, _ = intent_router.route(message.text.strip().lower())
+        stats = by_intent.setdefault(intent, {'latencies': [], 'errors': 0})
+        stats['latencies'].append(latency)
+        if error is not None:
+            stats['errors'] += 1
+
+    print(f"\nСообщений: {len(messages)}, время: {elapsed:.2f} с, пропускная способность: {len(messages) / elapsed:.1f} сообщ./с")
+    print(f"{'intent':<22} {'count':>6} {'exceptions':>10} {'p50, ms':>9} {'p95, ms':>9} {'p99, ms':>9}")
+    all_latencies = []
+    for intent, stats in sorted(by_intent.items()):
+        latencies = stats['latencies']
+        all_latencies.extend(latencies)
+        print(f"{intent:<22} {len(latencies):>6} {stats['errors']:>10} "
+              f"{percentile(latencies, 50) * 1000:>9.1f} {percentile(latencies, 95) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f}")
+    print(f"{'total':<22} {len(all_latencies):>6} {sum(s['errors'] for s in by_intent.values()):>10} "
+          f"{percentile(all_latencies, 50) * 1000:>9.1f} {percentile(all_latencies, 95) * 1000:>9.1f} {percentile(all_latencies, 99) * 1000:>9.1f}")
+
+    failures = {key: value for key, value in (failures or {}).items() if value}
+    if failures:
+        print(f"\nВНИМАНИЕ: сбои внешних сервисов, часть ответов — запасной текст ({sum(failures.values())}):")
+        print(f"{'failure':<18} {'upstream / reason':<22} {'count':>6}")
+        for (kind, label), value in sorted(failures.items()):
+            print(f"{kind:<18} {label:<22} {value:>6}")
+    else:
+        print("\nСбоев внешних сервисов нет")
+
+    # ru_maxrss в Linux измеряется в килобайтах
+    print(f"\nПиковая память процесса (max RSS): {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} МБ")
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        print(f"Пиковый объем Python-объектов (tracemalloc): {peak / 1024 / 1024:.1f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест обработчиков бота с заглушками внешних сервисов")
+    parser.add_argument('--messages', type=int, default=300, help="количество сообщений")
+    parser.add_argument('--concurrency', type=int, default=20, help="сколько сообщений обрабатывается одновременно")
+    parser.add_argument('--warmup', type=int, default=10, help="сообщений для прогрева (не учитываются)")
+    parser.add_argument('--runtime', choices=['sync', 'async'], default='sync')
+    parser.add_argument('--latency', default='', help="задержки сервисов, например openai=0.5,bing=0.1")
+    parser.add_argument('--errors', default='', help="доли ошибок, например weather=0.2")
+    parser.add_argument('--trace-memory', action='store_true', help="учитывать пиковую память через tracemalloc (медленнее)")
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    process, port = start_stubs(parse_service_values(args.latency), parse_service_values(args.errors))
+    try:
+        # Переменные окружения должны быть заданы до импорта модулей бота
+        os.environ.update(stub_urls(port))
+        os.environ.update({
+            'TELEGRAM_TOKEN': '123456:bench',
+            'OPENAI_API_KEY': 'bench',
+            'BING_API_KEY': 'bench',
+            'WEATHER_API_KEY': 'bench',
+            'METRICS_PORT': '0',
+        })
+
+        if args.warmup:
+            replay(args.runtime, synthetic_messages(args.warmup, seed=args.seed + 1), args.concurrency)
+
+        messages = synthetic_messages(args.messages, seed=args.seed)
+        if args.trace_memory:
+            tracemalloc.start()
+        before = failure_counters()
+        started = time.perf_counter()
+        results = replay(args.runtime, messages, args.concurrency)
+        elapsed = time.perf_counter() - started
+        failures = {key: value - before.get(key, 0) for key, value in failure_counters().items()}
+        report(messages, results, elapsed, args.trace_memory, failures)
+    finally:
+        process.terminate()
+        process.join(timeout=5)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Отправка записанных обновлений Telegram на webhook-приемник (webhook_bot.py).
+
+Обновления читаются из файла (по одному JSON на строку, как в updates.jsonl)
+или генерируются из синтетической смеси сообщений load_test.py.
+
+Локальная проверка без Telegram:
+    python benchmarks/stubs.py --port 8999          # в другом терминале; задать выведенные переменные
+    WEBHOOK_PORT=8443 python webhook_bot.py          # в другом терминале
+    python benchmarks/replay_updates.py benchmarks/updates.jsonl
+    python benchmarks/replay_updates.py --synthetic 500 --concurrency 50
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import synthetic_messages
+
+
+def load_updates(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def synthetic_updates(count, seed=1):
+    now = int(time.time())
+    return [
+        {
+            'update_id': message.message_id,
+            'message': {
+                'message_id': message.message_id,
+                'date': now,
+                'chat': {'id': message.chat.id, 'type': 'private'},
+                'from': {'id': message.from_user.id, 'is_bot': False, 'first_name': 'Bench'},
+                'text': message.text,
+            },
+        }
+        for message in synthetic_messages(count, seed=seed)
+    ]
+
+
+def post_update(url, update, secret=''):
+    request = urllib.request.Request(url, data=json.dumps(update, ensure_ascii=False).encode('utf-8'), method='POST')
+    request.add_header('Content-Type', 'application/json')
+    if secret:
+        request.add_header('X-Telegram-Bot-Api-Secret-Token', secret)
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError as e:
+        return type(e).__name__
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отправка обновлений Telegram на webhook-приемник")
+    parser.add_argument('path', nargs='?', help="файл с обновлениями (JSON на строку)")
+    parser.add_argument('--synthetic', type=int, default=0, help="сгенерировать столько обновлений вместо файла")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{os.getenv('WEBHOOK_PORT', 8443)}{os.getenv('WEBHOOK_PATH', '/telegram')}")
+    parser.add_argument('--secret', default=os.getenv('WEBHOOK_SECRET', ''))
+    parser.add_argument('--concurrency', type=int, default=1, help="параллельных запросов (1 — строго по порядку)")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        updates = synthetic_updates(args.synthetic)
+    elif args.path:
+        updates = load_updates(args.path)
+    else:
+        parser.error("укажите файл с обновлениями или --synthetic N")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        statuses = Counter(pool.map(lambda update: post_update(args.url, update, args.secret), updates))
+    elapsed = time.perf_counter() - started
+
+    print(f"Отправлено обновлений: {len(updates)} за {elapsed:.2f} с ({len(updates) / elapsed:.1f} в секунду)")
+    for status, count in sorted(statuses.items(), key=str):
+        print(f"  {status}: {count}")
+
+
+if __name__ == "__main__":
+    main()
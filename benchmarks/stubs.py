@@ -0,0 +1,257 @@
+"""
+Локальные заглушки внешних сервисов для бенчмарков: Telegram Bot API, Bing,
+OpenWeatherMap, RSS-ленты, страницы статей и OpenAI (включая потоковые ответы).
+
+Для каждого сервиса задаются задержка и доля ошибок (HTTP 500).
+
+Запуск отдельно: python benchmarks/stubs.py --port 8999 --latency openai=0.5 --errors bing=0.1
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from email.utils import formatdate
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVICES = ('telegram', 'bing', 'weather', 'rss', 'pages', 'openai')
+DEFAULT_LATENCY = {
+    'telegram': 0.03,
+    'bing': 0.15,
+    'weather': 0.1,
+    'rss': 0.3,
+    'pages': 0.2,
+    'openai': 0.8,
+}
+OPENAI_TOKEN_INTERVAL = 0.02  # пауза между токенами потокового ответа, секунды
+RSS_FEEDS = 2
+RSS_ITEMS = 30
+
+ANSWER_WORDS = (
+    "Пафос славится археологическим парком, гробницами царей и набережной у средневековой крепости. "
+    "Лучшее время для прогулок — утро или вечер, а пляжи Корал-Бэй подходят для семейного отдыха."
+).split()
+
+
+def parse_service_values(text):
+    """
+    Разбор строки вида "openai=0.5,bing=0.1" в словарь.
+    """
+    values = {}
+    for item in filter(None, (text or '').split(',')):
+        name, _, value = item.partition('=')
+        if name not in SERVICES:
+            raise ValueError(f"Неизвестный сервис: {name}")
+        values[name] = float(value)
+    return values
+
+
+def stub_urls(port, host='127.0.0.1'):
+    """
+    Переменные окружения, направляющие бота на заглушки.
+    """
+    base = f"http://{host}:{port}"
+    return {
+        'TELEGRAM_API_URL': base + '/telegram/bot{0}/{1}',
+        'BING_SEARCH_ENDPOINT': base + '/bing/v7.0/search',
+        'WEATHER_API_URL': base + '/weather/data/2.5/weather',
+        'NEWS_FEEDS': ','.join(f"{base}/rss/{index}" for index in range(RSS_FEEDS)),
+        'OPENAI_BASE_URL': base + '/openai/v1',
+    }
+
+
+def _rss_feed(index, base):
+    items = []
+    now = int(time.time())
+    for item in range(RSS_ITEMS):
+        published = formatdate(now - (item * RSS_FEEDS + index) * 600, usegmt=True)
+        items.append(
+            f"<item><title>Новость {index}-{item}</title><link>{base}/news/{index}/{item}</link>"
+            f"<pubDate>{published}</pubDate></item>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Лента {index}</title><link>{base}</link><description>stub</description>"
+        + ''.join(items) + '</channel></rss>'
+    )
+
+
+def _article(index):
+    paragraphs = ''.join(f"<p>{' '.join(ANSWER_WORDS)} Абзац {number} статьи {index}.</p>" for number in range(40))
+    return f"<html><head><title>Статья {index}</title><script>var x = 1;</script></head><body>{paragraphs}</body></html>"
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = DEFAULT_LATENCY
+    error_rate = {}
+    _message_ids = iter(range(1, 1 << 62))
+    _message_ids_lock = threading.Lock()
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _dispatch(self):
+        path = urlparse(self.path).path
+        service = path.strip('/').split('/')[0]
+        body = self._read_body()
+        if service not in SERVICES:
+            self._send_json(404, {'error': 'not found'})
+            return
+
+        time.sleep(self.latency.get(service, 0))
+        if random.random() < self.error_rate.get(service, 0):
+            self._send_json(500, {'ok': False, 'error': {'message': 'injected error'}})
+            return
+        getattr(self, f"_handle_{service}")(path, body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    def _base(self):
+        return f"http://{self.headers.get('Host')}"
+
+    def _handle_telegram(self, path, body):
+        method = path.rstrip('/').split('/')[-1]
+        if method == 'getUpdates':
+            # Момент первого опроса — бот запустился и готов принимать сообщения
+            if getattr(self.server, 'first_poll_at', None) is None:
+                self.server.first_poll_at = time.perf_counter()
+            time.sleep(0.5)
+            self._send_json(200, {'ok': True, 'result': []})
+            return
+        if method == 'getMe':
+            self._send_json(200, {'ok': True, 'result': {'id': 1, 'is_bot': True, 'first_name': 'Stub', 'username': 'stub_bot'}})
+            return
+        if method in ('deleteWebhook', 'setWebhook'):
+            self._send_json(200, {'ok': True, 'result': True})
+            return
+
+        # Остальные методы Bot API (sendMessage, editMessageText) отвечают сообщением
+        with self._message_ids_lock:
+            message_id = next(self._message_ids)
+        self._send_json(200, {'ok': True, 'result': {
+            'message_id': message_id,
+            'date': int(time.time()),
+            'chat': {'id': 1, 'type': 'private'},
+            'text': 'ok',
+        }})
+
+    def _handle_bing(self, path, body):
+        base = self._base()
+        count = int(parse_qs(urlparse(self.path).query).get('count', ['3'])[0])
+        first = random.randint(0, 1000)
+        pages = [{'name': f"Статья {index}", 'url': f"{base}/pages/{index}"} for index in range(first, first + count)]
+        self._send_json(200, {'webPages': {'value': pages}})
+
+    def _handle_weather(self, path, body):
+        self._send_json(200, {'main': {'temp': round(random.uniform(18, 32), 1)}})
+
+    def _handle_rss(self, path, body):
+        index = int(path.rstrip('/').split('/')[-1] or 0)
+        etag = f'"feed-{index}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.send_header('ETag', etag)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self._send(200, _rss_feed(index, self._base()).encode('utf-8'), 'application/rss+xml; charset=utf-8', {'ETag': etag})
+
+    def _handle_pages(self, path, body):
+        index = path.rstrip('/').split('/')[-1]
+        self._send(200, _article(index).encode('utf-8'), 'text/html; charset=utf-8')
+
+    def _handle_openai(self, path, body):
+        request = json.loads(body or b'{}')
+        words = ANSWER_WORDS[:max(1, min(len(ANSWER_WORDS), request.get('max_tokens') or len(ANSWER_WORDS)))]
+        if not request.get('stream'):
+            self._send_json(200, {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': request.get('model'),
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ' '.join(words)}, 'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': len(body) // 4, 'completion_tokens': len(words), 'total_tokens': len(body) // 4 + len(words)},
+            })
+            return
+
+        # Потоковый ответ в формате server-sent events
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for word in words:
+            chunk = {
+                'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': request.get('model'),
+                'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            time.sleep(OPENAI_TOKEN_INTERVAL)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def make_stub_server(port, latency=None, error_rate=None, host='127.0.0.1'):
+    """
+    Создание сервера заглушек без запуска.
+
+    :param latency: Задержка ответа по сервисам, секунды.
+    :param error_rate: Доля ответов с ошибкой 500 по сервисам (0..1).
+    :return: ThreadingHTTPServer; после первого getUpdates у него выставляется first_poll_at (time.perf_counter()).
+    """
+    handler = type('ConfiguredStubHandler', (StubHandler,), {
+        'latency': {**DEFAULT_LATENCY, **(latency or {})},
+        'error_rate': dict(error_rate or {}),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.first_poll_at = None
+    return server
+
+
+def serve_stubs(port, latency=None, error_rate=None, host='127.0.0.1', ready=None):
+    """
+    Запуск сервера заглушек (блокирующий).
+
+    :param ready: multiprocessing.Event, который выставляется после старта.
+    """
+    server = make_stub_server(port, latency, error_rate, host)
+    if ready is not None:
+        ready.set()
+    server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушки внешних сервисов бота")
+    parser.add_argument('--port', type=int, default=8999)
+    parser.add_argument('--latency', default='', help="задержки, например openai=0.5,bing=0.1")
+    parser.add_argument('--errors', default='', help="доли ошибок, например weather=0.2")
+    args = parser.parse_args()
+
+    for name, value in stub_urls(args.port).items():
+        print(f"{name}={value}")
+    serve_stubs(args.port, parse_service_values(args.latency), parse_service_values(args.errors))
+
+
+if __name__ == "__main__":
+    main()
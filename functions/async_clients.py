@@ -0,0 +1,46 @@
+import os
+import aiohttp
+from functions.upstream import upstreams
+
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 100))  # всего соединений в пуле
+HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', 20))  # соединений на один хост
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 15))  # общий таймаут запроса, секунды
+
+_http_session = None
+_openai_client = None
+
+
+def get_http_session():
+    """
+    Возвращает общую aiohttp.ClientSession с пулом keep-alive соединений.
+    Создается при первом обращении, должна вызываться внутри работающего event loop.
+    """
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=HTTP_POOL_SIZE, limit_per_host=HTTP_POOL_PER_HOST, ttl_dns_cache=300)
+        _http_session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT))
+    return _http_session
+
+
+def get_openai_client():
+    """
+    Возвращает общий асинхронный клиент OpenAI (использует OPENAI_API_KEY из окружения).
+    """
+    global _openai_client
+    if _openai_client is None:
+        from openai import AsyncOpenAI
+        _openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), timeout=upstreams['openai'].timeout)
+    return _openai_client
+
+
+async def close_clients():
+    """
+    Закрывает общие клиенты при остановке бота.
+    """
+    global _http_session, _openai_client
+    if _http_session is not None and not _http_session.closed:
+        await _http_session.close()
+    if _openai_client is not None:
+        await _openai_client.close()
+    _http_session = None
+    _openai_client = None
@@ -0,0 +1,265 @@
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from collections import OrderedDict
+
+
+class _InflightCall:
+    """
+    Загрузка значения, которую ждут все параллельные запросы того же ключа.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TTLCache:
+    """
+    Потокобезопасный кэш в памяти со временем жизни записей.
+
+    - Параллельные промахи по одному ключу объединяются в одну загрузку.
+    - Устаревшее значение (не старше ttl + stale_ttl) отдается сразу,
+      а обновление запускается в фоне.
+    - При превышении max_size вытесняются давно не использованные ключи (LRU).
+
+    Поддерживает синхронные загрузчики (get_or_load) и корутины (aget_or_load).
+    """
+
+    def __init__(self, ttl, stale_ttl=0, max_size=None):
+        """
+        :param ttl: Время, в течение которого значение считается свежим, секунды.
+        :param stale_ttl: Сколько секунд после истечения ttl можно отдавать устаревшее значение.
+        :param max_size: Максимальное количество записей (None — без ограничения).
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+        self._inflight = {}  # key -> _InflightCall
+        self._async_inflight = {}  # key -> asyncio.Future
+        self._background_tasks = set()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, allow_stale=False):
+        """
+        Возвращает значение из кэша или None, если его нет или оно устарело.
+        """
+        value, state = self._lookup(key)
+        if state == 'fresh' or (allow_stale and state == 'stale'):
+            return value
+        return None
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            if self.max_size is not None:
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def items(self):
+        """
+        Снимок свежих записей в виде списка (key, value).
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (value, stored_at) in self._entries.items() if now - stored_at < self.ttl]
+
+    def get_or_load(self, key, loader):
+        """
+        Возвращает значение по ключу, при необходимости вызывая loader().
+
+        :param key: Ключ кэша.
+        :param loader: Функция без аргументов, возвращающая значение.
+        :return: Значение из кэша или результат loader().
+        """
+        value, state = self._lookup(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            self._refresh_in_background(key, loader)
+            return value
+        return self._load(key, loader)
+
+    async def aget_or_load(self, key, loader):
+        """
+        Асинхронная версия get_or_load.
+
+        :param loader: Функция без аргументов, возвращающая корутину.
+        """
+        value, state = self._lookup(key)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            if key not in self._async_inflight:
+                task = asyncio.create_task(self._aload(key, loader))
+                self._background_tasks.add(task)
+                task.add_done_callback(self._finish_background_task)
+            return value
+        return await self._aload(key, loader)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, 'missing'
+            value, stored_at = entry
+            age = time.monotonic() - stored_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                return value, 'fresh'
+            if age < self.ttl + self.stale_ttl:
+                return value, 'stale'
+            del self._entries[key]
+            return None, 'missing'
+
+    def _load(self, key, loader):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InflightCall()
+
+        if not leader:
+            # Значение уже загружается другим потоком — ждем его результат
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = loader()
+            self.set(key, call.value)
+            return call.value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.event.set()
+
+    def _refresh_in_background(self, key, loader):
+        with self._lock:
+            if key in self._inflight:
+                return
+
+        def refresh():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                print(f"Ошибка при фоновом обновлении кэша для {key}: {e}")
+
+        threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
+
+    async def _aload(self, key, loader):
+        future = self._async_inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        # Помечаем исключение как полученное, даже если результат никто не ждет
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._async_inflight[key] = future
+        try:
+            value = await loader()
+            self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+            raise
+        finally:
+            del self._async_inflight[key]
+
+    def _finish_background_task(self, task):
+        self._background_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Ошибка при фоновом обновлении кэша: {task.exception()}")
+
+
+class SQLiteTTLCache(TTLCache):
+    """
+    TTLCache, записи которого дублируются в локальный файл SQLite и
+    переживают перезапуск бота. Значения должны сериализоваться в JSON.
+
+    Чтения идут только из памяти; в файл пишутся set/delete/clear, а размер
+    файла ограничивается тем же max_size (остаются самые свежие записи).
+    """
+
+    def __init__(self, path, ttl, stale_ttl=0, max_size=None):
+        """
+        :param path: Путь к файлу SQLite (каталог создается при необходимости).
+        """
+        super().__init__(ttl, stale_ttl=stale_ttl, max_size=max_size)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db_lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL)")
+        self._db.commit()
+        self._restore()
+
+    def set(self, key, value):
+        super().set(key, value)
+        try:
+            with self._db_lock, self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries (key, value, stored_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), time.time()),
+                )
+                if self.max_size is not None:
+                    self._db.execute(
+                        "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                        (self.max_size,),
+                    )
+        except Exception as e:
+            print(f"Ошибка при сохранении кэша на диск: {e}")
+
+    def delete(self, key):
+        super().delete(key)
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def clear(self):
+        super().clear()
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM entries")
+
+    def close(self):
+        with self._db_lock:
+            self._db.close()
+
+    def _restore(self):
+        now = time.time()
+        with self._db_lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE stored_at < ?", (now - self.ttl - self.stale_ttl,))
+            rows = self._db.execute("SELECT key, value, stored_at FROM entries ORDER BY stored_at").fetchall()
+
+        with self._lock:
+            for key, value, stored_at in rows:
+                # Время записи переводим со шкалы time.time() на шкалу time.monotonic()
+                self._entries[key] = (json.loads(value), time.monotonic() - (now - stored_at))
+            if self.max_size is not None:
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
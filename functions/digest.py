@@ -0,0 +1,243 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functions.news import news_store
+from functions.metrics import Counter
+
+NEWS_SUBSCRIBERS_DB = os.getenv('NEWS_SUBSCRIBERS_DB', 'subscribers.sqlite3')
+NEWS_DIGEST_INTERVAL = int(os.getenv('NEWS_DIGEST_INTERVAL', 24 * 60 * 60))  # секунды между дайджестами
+NEWS_DIGEST_SIZE = int(os.getenv('NEWS_DIGEST_SIZE', 10))  # новостей в дайджесте
+NEWS_DIGEST_BATCH_SIZE = int(os.getenv('NEWS_DIGEST_BATCH_SIZE', 25))  # сообщений в одной пачке
+NEWS_DIGEST_BATCH_INTERVAL = float(os.getenv('NEWS_DIGEST_BATCH_INTERVAL', 1.0))  # секунды между пачками (лимит Telegram ~30 в секунду)
+NEWS_DIGEST_CHECK_INTERVAL = 60  # как часто проверять, не пора ли отправлять, секунды
+
+DIGEST_MESSAGES = Counter('bot_news_digest_messages_total', 'Отправка дайджеста новостей подписчикам', ['result'])
+
+
+class SubscriberStore:
+    """
+    Подписчики на дайджест новостей в файле SQLite.
+
+    Файл общий для нескольких процессов бота, в нем же хранятся время
+    последнего дайджеста и позиция последней вошедшей в него новости:
+    отправку выполняет тот процесс, который первым отметил ее в транзакции. Соединение открывается при первом обращении.
+    """
+
+    def __init__(self, path=NEWS_SUBSCRIBERS_DB):
+        """
+        :param path: Путь к файлу SQLite.
+        """
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM subscribers").fetchone()[0]
+
+    def __contains__(self, chat_id):
+        with self._lock:
+            return self._connection().execute("SELECT 1 FROM subscribers WHERE chat_id = ?", (chat_id,)).fetchone() is not None
+
+    def add(self, chat_id):
+        """
+        :return: False, если чат уже подписан.
+        """
+        with self._lock:
+            cursor = self._connection().execute(
+                "INSERT OR IGNORE INTO subscribers (chat_id, subscribed_at) VALUES (?, ?)", (chat_id, time.time())
+            )
+            return cursor.rowcount > 0
+
+    def remove(self, chat_id):
+        """
+        :return: False, если чат не был подписан.
+        """
+        with self._lock:
+            return self._connection().execute("DELETE FROM subscribers WHERE chat_id = ?", (chat_id,)).rowcount > 0
+
+    def batches(self, size):
+        """
+        Идентификаторы чатов пачками по size; читается по одной пачке за раз.
+        """
+        last = None
+        while True:
+            with self._lock:
+                rows = self._connection().execute(
+                    "SELECT chat_id FROM subscribers WHERE ? IS NULL OR chat_id > ? ORDER BY chat_id LIMIT ?",
+                    (last, last, size),
+                ).fetchall()
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield [chat_id for chat_id, in rows]
+
+    def claim_digest(self, interval):
+        """
+        Отмечает отправку дайджеста, если с прошлой прошло не меньше interval секунд.
+
+        :return: Позиция последней новости прошлого дайджеста (NewsStore.arrival_cursor;
+                 None — дайджестов не было) или False, если отправлять еще рано
+                 либо дайджест уже отправляет другой процесс.
+        """
+        with self._lock:
+            db = self._connection()
+            now = time.time()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                row = db.execute("SELECT sent_at, cursor FROM digest_state WHERE id = 1").fetchone()
+                if row is not None and now - row[0] < interval:
+                    db.execute("ROLLBACK")
+                    return False
+                db.execute(
+                    "INSERT OR REPLACE INTO digest_state (id, sent_at, cursor) VALUES (1, ?, ?)",
+                    (now, row[1] if row else None),
+                )
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+        return json.loads(row[1]) if row and row[1] else None
+
+    def set_digest_cursor(self, cursor):
+        with self._lock:
+            self._connection().execute("UPDATE digest_state SET cursor = ? WHERE id = 1", (json.dumps(cursor),))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    def _connection(self):
+        if self._db is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS subscribers (chat_id INTEGER PRIMARY KEY, subscribed_at REAL NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS digest_state (id INTEGER PRIMARY KEY, sent_at REAL NOT NULL, cursor TEXT)")
+            self._db = db
+        return self._db
+
+
+news_subscribers = SubscriberStore()
+
+
+def render_digest(entries, size=NEWS_DIGEST_SIZE):
+    """
+    Текст дайджеста из уже отформатированных записей (от новых к старым).
+    """
+    text = "Дайджест новостей Пафоса:\n" + "\n".join(entry.text for entry in entries[:size])
+    if len(entries) > size:
+        text += f"\nИ еще новостей: {len(entries) - size}. Напишите 'что нового', чтобы посмотреть."
+    return text
+
+
+class NewsDigest:
+    """
+    Периодический дайджест новостей для подписчиков.
+
+    Текст готовится один раз из новостей, появившихся после прошлого дайджеста,
+    и рассылается пачками: сообщения одной пачки отправляются параллельно,
+    пачки — не чаще раза в batch_interval секунд, чтобы не упираться в лимиты
+    Telegram. Чаты, заблокировавшие бота, отписываются.
+    """
+
+    def __init__(self, send, subscribers=None, store=None, interval=NEWS_DIGEST_INTERVAL,
+                 batch_size=NEWS_DIGEST_BATCH_SIZE, batch_interval=NEWS_DIGEST_BATCH_INTERVAL):
+        """
+        :param send: Функция send(chat_id, text), отправляющая сообщение.
+        :param subscribers: Хранилище подписчиков (по умолчанию общий news_subscribers).
+        :param store: Хранилище новостей (по умолчанию общий news_store).
+        :param interval: Интервал между дайджестами, секунды.
+        :param batch_size: Сообщений в одной пачке.
+        :param batch_interval: Минимальный интервал между пачками, секунды.
+        """
+        self.send = send
+        self.subscribers = news_subscribers if subscribers is None else subscribers
+        self.store = news_store if store is None else store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """
+        Готовит и рассылает дайджест, если пора.
+
+        :return: Количество доставленных сообщений.
+        """
+        cursor = self.subscribers.claim_digest(self.interval)
+        if cursor is False:
+            return 0
+        if cursor is None:
+            # Первый дайджест — новости, появившиеся за последний интервал
+            cursor = (time.time() - self.interval, '')
+        entries = self.store.added_after(cursor)
+        if not entries:
+            return 0
+        self.subscribers.set_digest_cursor(self.store.arrival_cursor(entries[-1]))
+        # В дайджесте новости идут от новых к старым
+        return self.deliver(render_digest(entries[::-1]))
+
+    def deliver(self, text):
+        """
+        Рассылает готовый текст всем подписчикам пачками.
+
+        :return: Количество доставленных сообщений.
+        """
+        delivered = 0
+        with ThreadPoolExecutor(max_workers=self.batch_size, thread_name_prefix='news-digest') as pool:
+            for batch in self.subscribers.batches(self.batch_size):
+                started = time.monotonic()
+                delivered += sum(pool.map(lambda chat_id: self._send(chat_id, text), batch))
+                if self._stop.wait(max(self.batch_interval - (time.monotonic() - started), 0)):
+                    break
+        return delivered
+
+    def _send(self, chat_id, text):
+        try:
+            self.send(chat_id, text)
+        except Exception as e:
+            # 403: пользователь заблокировал бота или удалил чат
+            if getattr(e, 'error_code', None) == 403:
+                self.subscribers.remove(chat_id)
+                DIGEST_MESSAGES.inc(result='unsubscribed')
+            else:
+                print(f"Ошибка при отправке дайджеста в чат {chat_id}: {e}")
+                DIGEST_MESSAGES.inc(result='error')
+            return False
+        DIGEST_MESSAGES.inc(result='sent')
+        return True
+
+    def start(self):
+        """
+        Запускает фоновый поток рассылки.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='news-digest', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Останавливает рассылку (текущая пачка дорабатывается).
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(NEWS_DIGEST_CHECK_INTERVAL):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Ошибка при рассылке дайджеста новостей: {e}")
@@ -0,0 +1,95 @@
+import os
+import time
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functions.metrics import track_stage
+
+FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', 32))
+
+_fanout_executor = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix='fan-out')
+
+
+class Source:
+    """
+    Независимый источник данных для ответа с собственным дедлайном.
+    """
+
+    def __init__(self, name, call, deadline, fallback=None):
+        """
+        :param name: Имя источника (ключ результата и метка этапа в метриках).
+        :param call: Функция без аргументов; для fan_out_async — возвращающая корутину.
+                     Для fan_out можно передать уже запущенный Future (например, задачу
+                     планировщика): его ожидание не занимает поток fan-out.
+        :param deadline: Сколько секунд от старта ждать результат.
+        :param fallback: Значение, если источник упал или не успел к дедлайну.
+        """
+        self.name = name
+        self.call = call
+        self.deadline = deadline
+        self.fallback = fallback
+
+
+def _run(source):
+    with track_stage(source.name):
+        return source.call()
+
+
+def _start(source):
+    if isinstance(source.call, Future):
+        return source.call
+    return _fanout_executor.submit(_run, source)
+
+
+def fan_out(sources):
+    """
+    Запускает все источники одновременно и собирает то, что успело прийти.
+
+    Общая задержка — не больше максимального дедлайна, а не сумма времен источников.
+    Не успевшие вызовы дорабатывают в фоне (и, например, наполняют кэши).
+
+    :param sources: Список Source.
+    :return: Словарь name -> результат или fallback.
+    """
+    started = time.monotonic()
+    futures = [(source, _start(source)) for source in sources]
+    results = {}
+    for source, future in sorted(futures, key=lambda item: item[0].deadline):
+        try:
+            results[source.name] = future.result(timeout=max(started + source.deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            print(f"Источник {source.name} не успел за {source.deadline} с")
+            results[source.name] = source.fallback
+        except Exception as e:
+            print(f"Ошибка источника {source.name}: {e}")
+            results[source.name] = source.fallback
+    return results
+
+
+async def _arun(source):
+    with track_stage(source.name):
+        return await source.call()
+
+
+async def fan_out_async(sources):
+    """
+    Асинхронная версия fan_out: не успевшие к дедлайну задачи отменяются.
+    """
+    started = time.monotonic()
+    tasks = [(source, asyncio.create_task(_arun(source))) for source in sources]
+    results = {}
+    try:
+        for source, task in sorted(tasks, key=lambda item: item[0].deadline):
+            try:
+                timeout = max(started + source.deadline - time.monotonic(), 0)
+                results[source.name] = await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                print(f"Источник {source.name} не успел за {source.deadline} с")
+                results[source.name] = source.fallback
+            except Exception as e:
+                print(f"Ошибка источника {source.name}: {e}")
+                results[source.name] = source.fallback
+    finally:
+        for _, task in tasks:
+            if not task.done():
+                task.cancel()
+    return results
@@ -0,0 +1,303 @@
+import os
+import time
+import asyncio
+import weakref
+import threading
+from collections import deque
+from concurrent.futures import Future
+from functions.cache import TTLCache
+from functions.metrics import Gauge, JOB_QUEUE_SECONDS, JOBS_REJECTED
+
+JOB_MAX_CONCURRENT = int(os.getenv('JOB_MAX_CONCURRENT', 8))  # тяжелых задач одновременно на процесс
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 100))  # задач в ожидании, сверх этого — отказ
+JOB_RATE = float(os.getenv('JOB_RATE', 6))  # задач в минуту на пользователя
+JOB_BURST = int(os.getenv('JOB_BURST', 3))  # сколько задач пользователь может отправить подряд
+JOB_MAX_USERS = 10000  # пользователей, для которых хранится лимит
+
+# Планировщики процесса: метрика очереди суммируется по ним, поэтому она отражает
+# тот планировщик, которым пользуется запущенный рантайм (потоковый или asyncio)
+_schedulers = weakref.WeakSet()
+Gauge('bot_jobs_queued', 'Тяжелые задачи в очереди', lambda: sum(len(scheduler) for scheduler in list(_schedulers)))
+
+
+class JobRejected(Exception):
+    """
+    Задача не принята планировщиком.
+    """
+
+
+class RateLimited(JobRejected):
+    """
+    Пользователь исчерпал свой лимит задач.
+    """
+
+    def __init__(self, retry_after):
+        super().__init__(f"лимит задач исчерпан, повторить через {retry_after:.1f} с")
+        self.retry_after = retry_after
+
+
+class QueueFull(JobRejected):
+    """
+    Очередь задач переполнена.
+    """
+
+
+class TokenBucket:
+    """
+    Ограничение частоты: не больше capacity задач подряд,
+    дальше — rate задач в минуту.
+    """
+
+    def __init__(self, rate=JOB_RATE, capacity=JOB_BURST):
+        self.rate = rate / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+
+    def try_acquire(self):
+        """
+        :return: 0, если задачу можно выполнить, иначе через сколько секунд появится токен.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate if self.rate else float('inf')
+
+
+class Job:
+    """
+    Задача в очереди планировщика.
+    """
+
+    def __init__(self, user_id, call, future):
+        self.user_id = user_id
+        self.call = call
+        self.future = future
+        self.position = 0  # примерная позиция в очереди при постановке; 0 — выполняется сразу
+        self.submitted_at = time.monotonic()
+
+    def result(self, timeout=None):
+        return self.future.result(timeout)
+
+
+class _FairQueue:
+    """
+    Очереди задач по пользователям с обслуживанием по кругу: за один
+    проход каждый пользователь получает не больше одной задачи, поэтому
+    поток запросов от одного человека не задерживает остальных.
+    """
+
+    def __init__(self, max_concurrent, max_queued, rate, burst):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.rate = rate
+        self.burst = burst
+        self.running = 0
+        self._queues = {}  # user_id -> deque задач
+        self._rotation = deque()  # пользователи с задачами в очереди, в порядке обслуживания
+        self._size = 0
+        # Корзина полностью восполняется за burst / rate минут, после этого ее можно забыть
+        self._buckets = TTLCache(ttl=burst / rate * 60 if rate else float('inf'), max_size=JOB_MAX_USERS)
+
+    def __len__(self):
+        return self._size
+
+    def push(self, user_id, job):
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+        retry_after = bucket.try_acquire()
+        self._buckets.set(user_id, bucket)
+        if retry_after:
+            JOBS_REJECTED.inc(reason='rate_limit')
+            raise RateLimited(retry_after)
+        if self._size >= self.max_queued:
+            JOBS_REJECTED.inc(reason='queue_full')
+            raise QueueFull("очередь задач переполнена")
+
+        user_queue = self._queues.get(user_id)
+        if user_queue is None:
+            user_queue = self._queues[user_id] = deque()
+            self._rotation.append(user_id)
+        # Перед задачей выполнятся: свои предыдущие задачи и до стольких же (+1) задач каждого другого пользователя
+        rounds = len(user_queue) + 1
+        ahead = sum(min(len(queue), rounds) for queue in self._queues.values())
+        free_slots = max(self.max_concurrent - self.running, 0)
+        job.position = max(ahead + 1 - free_slots, 0)
+        user_queue.append(job)
+        self._size += 1
+
+    def drain(self):
+        """
+        Извлекает все ожидающие задачи.
+        """
+        jobs = []
+        job = self.pop()
+        while job is not None:
+            jobs.append(job)
+            job = self.pop()
+        return jobs
+
+    def pop(self):
+        if not self._rotation:
+            return None
+        user_id = self._rotation.popleft()
+        user_queue = self._queues[user_id]
+        job = user_queue.popleft()
+        if user_queue:
+            self._rotation.append(user_id)
+        else:
+            del self._queues[user_id]
+        self._size -= 1
+        return job
+
+
+class JobScheduler:
+    """
+    Планировщик тяжелых задач (LLM, поиск с суммаризацией) для потоковой версии бота.
+
+    Не больше max_concurrent задач выполняются одновременно в собственных
+    потоках планировщика; остальные ждут в очереди с честным обслуживанием
+    пользователей по кругу. Частота задач каждого пользователя ограничена
+    корзиной токенов.
+    """
+
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, max_queued=JOB_QUEUE_SIZE, rate=JOB_RATE, burst=JOB_BURST):
+        """
+        :param max_concurrent: Сколько задач выполняется одновременно.
+        :param max_queued: Сколько задач может ждать в очереди.
+        :param rate: Задач в минуту на пользователя.
+        :param burst: Сколько задач пользователь может отправить подряд.
+        """
+        self._queue = _FairQueue(max_concurrent, max_queued, rate, burst)
+        self._condition = threading.Condition()
+        self._workers = []
+        _schedulers.add(self)
+
+    def __len__(self):
+        return len(self._queue)
+
+    def submit(self, user_id, call):
+        """
+        Ставит задачу в очередь.
+
+        :param call: Функция без аргументов.
+        :return: Job; результат — job.result().
+        :raises RateLimited: Пользователь превысил лимит.
+        :raises QueueFull: Очередь переполнена.
+        """
+        job = Job(user_id, call, Future())
+        with self._condition:
+            self._queue.push(user_id, job)
+            if not self._workers:
+                self._start_workers()
+            self._condition.notify()
+        return job
+
+    def _start_workers(self):
+        for number in range(self._queue.max_concurrent):
+            worker = threading.Thread(target=self._work, name=f'job-worker-{number}', daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                job = self._queue.pop()
+                while job is None:
+                    self._condition.wait()
+                    job = self._queue.pop()
+                self._queue.running += 1
+            try:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                JOB_QUEUE_SECONDS.observe(time.monotonic() - job.submitted_at)
+                try:
+                    job.future.set_result(job.call())
+                except Exception as e:
+                    print(f"Ошибка при выполнении задачи пользователя {job.user_id}: {e}")
+                    job.future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._queue.running -= 1
+
+
+class AsyncJobScheduler:
+    """
+    Версия JobScheduler для asyncio: задачи — корутины, выполняются
+    max_concurrent задачами-обработчиками в текущем цикле событий.
+    Обработчики привязаны к циклу: если submit вызван из другого цикла
+    (например, после нового asyncio.run), они создаются заново.
+    """
+
+    def __init__(self, max_concurrent=JOB_MAX_CONCURRENT, max_queued=JOB_QUEUE_SIZE, rate=JOB_RATE, burst=JOB_BURST):
+        self._queue = _FairQueue(max_concurrent, max_queued, rate, burst)
+        self._loop = None
+        self._condition = None
+        self._workers = []
+        _schedulers.add(self)
+
+    def __len__(self):
+        return len(self._queue)
+
+    async def submit(self, user_id, call):
+        """
+        Ставит задачу в очередь.
+
+        :param call: Функция без аргументов, возвращающая корутину.
+        :return: Job; результат — await job.future.
+        """
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._bind(loop)
+        future = loop.create_future()
+        # Помечаем исключение как полученное, даже если результат никто не ждет
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        job = Job(user_id, call, future)
+        self._queue.push(user_id, job)
+        async with self._condition:
+            self._condition.notify()
+        return job
+
+    async def close(self):
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._loop = None
+
+    def _bind(self, loop):
+        # Задачи прежнего цикла уже не выполнить: их future принадлежат завершенному циклу
+        for job in self._queue.drain():
+            if not job.future.done() and not job.future.get_loop().is_closed():
+                job.future.cancel()
+        self._queue.running = 0
+        self._loop = loop
+        self._condition = asyncio.Condition()
+        self._workers = [loop.create_task(self._work()) for _ in range(self._queue.max_concurrent)]
+
+    async def _work(self):
+        while True:
+            async with self._condition:
+                await self._condition.wait_for(lambda: len(self._queue) > 0)
+                job = self._queue.pop()
+            if job.future.cancelled():
+                continue
+            self._queue.running += 1
+            try:
+                JOB_QUEUE_SECONDS.observe(time.monotonic() - job.submitted_at)
+                result = await job.call()
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                print(f"Ошибка при выполнении задачи пользователя {job.user_id}: {e}")
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                self._queue.running -= 1
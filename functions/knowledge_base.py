@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import math
+import time
+import heapq
+import threading
+from collections import Counter
+
+KB_TOP_K = int(os.getenv('KB_TOP_K', 8))  # сколько фрагментов попадает в запрос к LLM
+# Если вся база меньше этого размера (в символах), в запрос передается она целиком
+KB_FULL_CONTEXT_CHARS = int(os.getenv('KB_FULL_CONTEXT_CHARS', 4000))
+KB_RELOAD_CHECK_INTERVAL = float(os.getenv('KB_RELOAD_CHECK_INTERVAL', 2))  # секунды
+
+_TOKEN = re.compile(r'\w+')
+_STEM_LENGTH = 5
+
+
+def tokenize(text):
+    """
+    Разбиение текста на термы: нижний регистр и грубый стемминг по префиксу,
+    чтобы "beach"/"beaches" и "пляжи"/"пляжей" совпадали.
+    """
+    return [token[:_STEM_LENGTH] for token in _TOKEN.findall(text.lower().replace('ё', 'е'))]
+
+
+def flatten_data(data, path=''):
+    """
+    Превращение JSON с данными о городе в список текстовых фрагментов.
+    Строки и элементы списков становятся отдельными фрагментами с указанием раздела.
+    """
+    if isinstance(data, dict):
+        if path and all(not isinstance(value, (dict, list)) for value in data.values()):
+            # Плоский объект (ресторан, пляж) — один фрагмент со всеми полями
+            fields = '; '.join(f"{key}: {value}" for key, value in data.items())
+            return [f"{path}: {fields}"]
+        chunks = []
+        for key, value in data.items():
+            chunks.extend(flatten_data(value, f"{path} > {key}" if path else str(key)))
+        return chunks
+    if isinstance(data, list):
+        chunks = []
+        for item in data:
+            chunks.extend(flatten_data(item, path))
+        return chunks
+    return [f"{path}: {data}" if path else str(data)]
+
+
+class _BM25Index:
+    """
+    Инвертированный индекс с ранжированием Okapi BM25.
+    """
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.total_chars = sum(len(chunk) for chunk in chunks)
+        self._postings = {}  # term -> [(chunk_id, tf)]
+        self._lengths = []
+        for chunk_id, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            self._lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self._postings.setdefault(term, []).append((chunk_id, tf))
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        count = len(chunks)
+        self._idf = {
+            term: math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    def search(self, query, top_k):
+        scores = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for chunk_id, tf in postings:
+                norm = self.k1 * (1 - self.b + self.b * self._lengths[chunk_id] / self._avg_length)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        # Сохраняем порядок фрагментов из исходного файла
+        return [self.chunks[chunk_id] for chunk_id, _ in sorted(best)]
+
+
+class KnowledgeBase:
+    """
+    Локальная база знаний о городе.
+
+    Файл загружается и индексируется один раз; при изменении файла индекс
+    перестраивается. Для запроса к LLM отбираются только top-k релевантных фрагментов.
+    """
+
+    def __init__(self, path, top_k=KB_TOP_K, full_context_chars=KB_FULL_CONTEXT_CHARS,
+                 reload_check_interval=KB_RELOAD_CHECK_INTERVAL, lazy=False):
+        """
+        :param path: Путь к JSON-файлу с данными.
+        :param top_k: Количество фрагментов в ответе search().
+        :param full_context_chars: Размер базы, до которого она передается целиком.
+        :param reload_check_interval: Как часто проверять изменение файла, секунды.
+        :param lazy: Загрузить файл при первом поиске, а не при создании (быстрый старт бота).
+        """
+        self.path = path
+        self.top_k = top_k
+        self.full_context_chars = full_context_chars
+        self.reload_check_interval = reload_check_interval
+        self._index = _BM25Index([])
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if not lazy:
+            self.reload()
+
+    def __len__(self):
+        return len(self._index.chunks)
+
+    def reload(self):
+        """
+        Перечитывает файл и перестраивает индекс, если файл изменился.
+        """
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                print(f"Ошибка при загрузке {self.path}: {e}")
+                return
+            version = (stat.st_mtime_ns, stat.st_size)
+            if version == self._version:
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except Exception as e:
+                # Оставляем предыдущий индекс, если новый файл не читается
+                print(f"Ошибка при загрузке {self.path}: {e}")
+                return
+            self._index = _BM25Index(flatten_data(data))
+            self._version = version
+
+    def search(self, query, top_k=None):
+        """
+        Отбор релевантных фрагментов для запроса.
+
+        :param query: Вопрос пользователя.
+        :param top_k: Количество фрагментов (по умолчанию self.top_k).
+        :return: Список текстовых фрагментов.
+        """
+        if time.monotonic() - self._checked_at >= self.reload_check_interval:
+            self.reload()
+        index = self._index
+        if index.total_chars <= self.full_context_chars:
+            return list(index.chunks)
+        return index.search(query, top_k or self.top_k)
@@ -0,0 +1,228 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9108))  # 0 — не запускать HTTP-эндпоинт
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class MetricsRegistry:
+    """
+    Набор метрик, которые отдаются в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _Metric:
+    type = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: ожидались метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple((name, labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    """
+    Монотонно растущий счетчик.
+    """
+    type = 'counter'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        """
+        :return: Словарь {кортеж значений меток: значение счетчика}.
+        """
+        with self._lock:
+            return {tuple(value for _, value in key): count for key, count in self._values.items()}
+
+    def collect(self):
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(key)} {value}" for key, value in values]
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение, которое вычисляется функцией в момент чтения метрик.
+    """
+    type = 'gauge'
+
+    def __init__(self, name, documentation, function, registry=REGISTRY):
+        super().__init__(name, documentation, registry=registry)
+        self._function = function
+
+    def collect(self):
+        try:
+            return [f"{self.name} {float(self._function())}"]
+        except Exception as e:
+            print(f"Ошибка при вычислении метрики {self.name}: {e}")
+            return []
+
+
+class Histogram(_Metric):
+    """
+    Гистограмма длительностей с фиксированными границами корзин.
+    """
+    type = 'histogram'
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # key -> [counts по корзинам..., sum, count]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def collect(self):
+        with self._lock:
+            values = [(key, list(state)) for key, state in self._values.items()]
+        lines = []
+        for key, state in values:
+            for bound, count in zip(self.buckets, state):
+                lines.append(f"{self.name}_bucket{_format_labels(key + (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(key + (('le', '+Inf'),))} {state[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {state[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {state[-1]}")
+        return lines
+
+
+MESSAGES = Counter('bot_messages_total', 'Обработанные сообщения по намерениям', ['intent'])
+HANDLER_SECONDS = Histogram('bot_handler_seconds', 'Время обработки сообщения по намерениям', ['intent'])
+STAGE_SECONDS = Histogram('bot_stage_seconds', 'Время отдельных этапов обработки', ['stage'])
+UPSTREAM_SECONDS = Histogram('bot_upstream_seconds', 'Время запросов к внешним сервисам', ['upstream'])
+UPSTREAM_ERRORS = Counter('bot_upstream_errors_total', 'Ошибки запросов к внешним сервисам', ['upstream'])
+TIME_TO_FIRST_TOKEN = Histogram('bot_time_to_first_token_seconds', 'Время до первого показанного токена ответа LLM')
+JOB_QUEUE_SECONDS = Histogram('bot_job_queue_seconds', 'Время ожидания тяжелых задач в очереди')
+JOBS_REJECTED = Counter('bot_jobs_rejected_total', 'Отклоненные тяжелые задачи', ['reason'])
+
+
+@contextmanager
+def track_handler(intent):
+    """
+    Учет обработки сообщения: счетчик и длительность по намерению.
+    """
+    MESSAGES.inc(intent=intent)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        HANDLER_SECONDS.observe(time.perf_counter() - started, intent=intent)
+
+
+@contextmanager
+def track_stage(stage):
+    """
+    Учет длительности внутреннего этапа обработки (поиск по базе знаний и т.п.).
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage=stage)
+
+
+@contextmanager
+def track_upstream(upstream):
+    """
+    Учет запроса к внешнему сервису: длительность и ошибки.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        UPSTREAM_ERRORS.inc(upstream=upstream)
+        raise
+    finally:
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, upstream=upstream)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Не засоряем вывод запросами Prometheus
+        pass
+
+
+def start_metrics_server(port=METRICS_PORT, host=METRICS_HOST):
+    """
+    Запускает HTTP-эндпоинт /metrics в фоновом потоке.
+
+    :return: Экземпляр сервера или None, если порт равен 0.
+    """
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+    return server
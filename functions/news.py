@@ -1,57 +1,332 @@
-import feedparser
-from datetime import datetime
+import os
+import time
+import bisect
+import calendar
+import hashlib
+import threading
+from collections import namedtuple
+from functions.upstream import upstreams
+from functions.sessions import session_store
 
-def fetch_latest_news(user_id, user_progress, items_per_page=5):
+NEWS_FEEDS = os.getenv(
+    'NEWS_FEEDS', "https://in-cyprus.philenews.com/category/local/feed/,https://cyprus-mail.com/tag/paphos/feed"
+).split(',')
+NEWS_REFRESH_INTERVAL = int(os.getenv('NEWS_REFRESH_INTERVAL', 300))  # секунды
+NEWS_MAX_ENTRIES = int(os.getenv('NEWS_MAX_ENTRIES', 500))
+
+# Запись ленты: текст для Telegram готовится один раз при разборе.
+# published — время публикации, added — время появления записи в хранилище (Unix-время)
+NewsEntry = namedtuple('NewsEntry', ['key', 'title', 'link', 'published', 'added', 'text'])
+
+
+def link_key(link):
+    """
+    Короткий ключ записи по ее ссылке: одна и та же новость из разных лент хранится один раз.
+    """
+    return hashlib.sha1(link.encode('utf-8')).hexdigest()[:16]
+
+
+def render_entry(title, link):
+    return f"**{title}**\n[Читать далее]({link})\n"
+
+
+class NewsStore:
+    """
+    Общий кэш новостей, который обновляется в фоне.
+
+    RSS-ленты запрашиваются условным GET (ETag/Last-Modified) через общий
+    клиент внешних сервисов (пул соединений, таймауты, повторы), новые записи
+    дедуплицируются по хэшу ссылки, форматируются один раз и вставляются
+    в два упорядоченных индекса: по дате публикации и по порядку появления.
+    Для чтения используется неизменяемый снимок (tuple), поэтому пагинация
+    и выборка новых записей (since, added_after) не требуют ни сети,
+    ни блокировок.
+
+    Порядок появления нужен для "что нового": новость, опубликованная давно,
+    но попавшая в ленту только сейчас, тоже новая для пользователя. Записи
+    первой загрузки считаются появившимися в момент публикации, поэтому
+    после перезапуска старые новости не становятся новыми.
+    """
+
+    def __init__(self, feeds=NEWS_FEEDS, refresh_interval=NEWS_REFRESH_INTERVAL, max_entries=NEWS_MAX_ENTRIES):
+        """
+        :param feeds: Список URL RSS-лент.
+        :param refresh_interval: Интервал фонового обновления в секундах.
+        :param max_entries: Максимальное количество хранимых новостей.
+        """
+        self.feeds = list(feeds)
+        self.refresh_interval = refresh_interval
+        self.max_entries = max_entries
+        self._validators = {}  # feed_url -> {'etag': ..., 'modified': ...}
+        self._order = []  # отсортированные пары (-published, key), от новых к старым
+        self._arrivals = []  # отсортированные пары (added, key), от старых к новым
+        self._entries = {}  # key -> NewsEntry
+        # Снимки записей в обоих порядках и параллельные им ключи для бинарного поиска,
+        # заменяются одним присваиванием
+        self._view = ((), (), (), ())
+        self._lock = threading.Lock()
+        self._loaded = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self):
+        return len(self._view[0])
+
+    def snapshot(self):
+        """
+        Возвращает текущий снимок новостей (от новых к старым).
+        Если лента еще ни разу не загружалась, выполняет загрузку синхронно.
+        """
+        self._ensure_loaded()
+        return self._view[0]
+
+    def since(self, timestamp):
+        """
+        Новости, опубликованные позже timestamp (от новых к старым).
+        Граница находится бинарным поиском, более старые записи не просматриваются.
+
+        :param timestamp: Unix-время; None — все новости.
+        """
+        self._ensure_loaded()
+        entries, timeline, _, _ = self._view
+        if timestamp is None:
+            return entries
+        return entries[:bisect.bisect_left(timeline, -timestamp)]
+
+    def added_after(self, cursor):
+        """
+        Новости, появившиеся в хранилище после cursor (от старых к новым).
+        Граница находится бинарным поиском, более старые записи не просматриваются.
+
+        :param cursor: Пара (added, key) последней просмотренной записи
+                       (см. arrival_cursor); None — все новости.
+        """
+        self._ensure_loaded()
+        _, _, arrivals, arrival_keys = self._view
+        if cursor is None:
+            return arrivals
+        return arrivals[bisect.bisect_right(arrival_keys, tuple(cursor)):]
+
+    @staticmethod
+    def arrival_cursor(entry):
+        """
+        Позиция записи в порядке появления; хранится в JSON как список [added, key].
+        """
+        return [entry.added, entry.key]
+
+    def _ensure_loaded(self):
+        if self._loaded.is_set():
+            return
+        if self._thread is not None and self._thread.is_alive():
+            # Первая загрузка уже идет в фоне — дожидаемся ее, а не дублируем запросы
+            self._loaded.wait(timeout=30)
+        else:
+            self.refresh()
+
+    def refresh(self):
+        """
+        Опрашивает все RSS-ленты и добавляет в хранилище только новые записи.
+        """
+        for feed_url in self.feeds:
+            # Ленту, которая еще ни разу не загрузилась (например, не ответила при старте),
+            # загружаем как первую: ее старые записи не должны попасть в "что нового"
+            first_load = feed_url not in self._validators
+            validators = self._validators.get(feed_url, {})
+            try:
+                feed, validators = self._fetch(feed_url, validators)
+            except Exception as e:
+                print(f"Ошибка при загрузке RSS-ленты {feed_url}: {e}")
+                continue
+
+            # 304 Not Modified — лента не изменилась с прошлого запроса
+            if feed is None:
+                continue
+
+            self._validators[feed_url] = validators
+            self._merge(self._parse_entry(entry, first_load) for entry in feed.entries)
+        self._loaded.set()
+
+    @staticmethod
+    def _fetch(feed_url, validators):
+        """
+        Условный GET ленты через общий пул соединений.
+
+        :return: (разобранная лента или None, если она не изменилась (304); новые ETag/Last-Modified).
+        """
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('modified'):
+            headers['If-Modified-Since'] = validators['modified']
+        # feedparser загружается при первом обновлении ленты, а не при старте бота
+        import feedparser
+
+        response = upstreams['rss'].get(feed_url, headers=headers)
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+        feed = feedparser.parse(response.content, response_headers={key.lower(): value for key, value in response.headers.items()})
+        if feed.get('bozo') and not feed.entries:
+            raise feed.get('bozo_exception') or ValueError("пустой ответ")
+        return feed, {'etag': response.headers.get('ETag'), 'modified': response.headers.get('Last-Modified')}
+
+    def start(self):
+        """
+        Запускает фоновый поток обновления ленты.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='news-refresh', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """
+        Останавливает фоновое обновление.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Ошибка при фоновом обновлении новостей: {e}")
+            self._stop.wait(self.refresh_interval)
+
+    def _parse_entry(self, entry, first_load=False):
+        """
+        :param first_load: Запись из первой успешной загрузки своей ленты.
+        """
+        link = entry.get('link', '')
+        key = link_key(link)
+        # Уже известная запись не разбирается и не форматируется повторно
+        if not link or key in self._entries:
+            return None
+        # Парсим дату публикации (время в лентах — UTC)
+        if 'published_parsed' in entry and entry.published_parsed:
+            published = calendar.timegm(entry.published_parsed)
+        else:
+            published = time.time()
+        published = float(published)
+        # Записи первой загрузки ленты "появились" при публикации, последующие — сейчас
+        now = time.time()
+        added = min(published, now) if first_load else now
+        title = entry.get('title', '')
+        return NewsEntry(key, title, link, published, added, render_entry(title, link))
+
+    def _merge(self, entries):
+        with self._lock:
+            changed = False
+            for entry in entries:
+                if entry is None or entry.key in self._entries:
+                    continue
+                bisect.insort(self._order, (-entry.published, entry.key))
+                bisect.insort(self._arrivals, (entry.added, entry.key))
+                self._entries[entry.key] = entry
+                changed = True
+
+            if not changed:
+                return
+
+            # Отбрасываем самые старые новости сверх лимита
+            while len(self._order) > self.max_entries:
+                _, key = self._order.pop()
+                entry = self._entries.pop(key)
+                del self._arrivals[bisect.bisect_left(self._arrivals, (entry.added, key))]
+
+            self._view = (
+                tuple(self._entries[key] for _, key in self._order),
+                tuple(order for order, _ in self._order),
+                tuple(self._entries[key] for _, key in self._arrivals),
+                tuple(self._arrivals),
+            )
+
+
+news_store = NewsStore()
+
+
+NEWS_CURSOR_FIELD = 'news_offset'
+NEWS_SEEN_FIELD = 'news_seen'  # позиция последней показанной новости в порядке появления
+
+
+def fetch_latest_news(user_id, sessions=None, items_per_page=5, store=None, advance=True):
     """
-    Получение последних новостей из нескольких RSS-лент с пагинацией для каждого пользователя.
+    Получение последних новостей из общего кэша RSS-лент с пагинацией для каждого пользователя.
 
     :param user_id: Идентификатор пользователя Telegram.
-    :param user_progress: Словарь, отслеживающий прогресс каждого пользователя.
-    :param feeds: Список URL RSS-лент.
+    :param sessions: Хранилище состояния пользователей (по умолчанию общий session_store).
     :param items_per_page: Количество новостей, выдаваемых за один раз.
+    :param store: Хранилище новостей (по умолчанию общий news_store).
+    :param advance: Сдвигать ли пагинацию; False — первая страница без изменения прогресса.
     :return: Список новостей для текущей страницы пользователя.
     """
-    # Объединяем все новости из всех источников
-    feeds = ["https://in-cyprus.philenews.com/category/local/feed/", "https://cyprus-mail.com/tag/paphos/feed"]
-    all_entries = []
-    for feed_url in feeds:
-        try:
-            feed = feedparser.parse(feed_url)
-            for entry in feed.entries:
-                # Парсим дату публикации
-                if 'published_parsed' in entry:
-                    published = datetime(*entry.published_parsed[:6])
-                else:
-                    published = datetime.now()
-                all_entries.append({
-                    'title': entry.title,
-                    'link': entry.link,
-                    # 'summary': entry.summary if 'summary' in entry else '',
-                    'published': published
-                })
-        except Exception as e:
-            print(f"Ошибка при загрузке RSS-ленты {feed_url}: {e}")
-
-    # Сортируем все новости по дате публикации (от новых к старым)
-    all_entries.sort(key=lambda x: x['published'], reverse=True)
-
-    # Получаем текущий прогресс пользователя
-    if user_id not in user_progress:
-        user_progress[user_id] = 0
-
-    start_index = user_progress[user_id]
-    end_index = start_index + items_per_page
-    paginated_entries = all_entries[start_index:end_index]
-
-    # Обновляем прогресс пользователя
-    user_progress[user_id] = end_index
-
-    # Форматируем новости для вывода
-    formatted_news = []
-    for entry in paginated_entries:
-        formatted_news.append(f"**{entry['title']}**\n[Читать далее]({entry['link']})\n") #\n{entry['summary']}
+    if store is None:
+        store = news_store
+    all_entries = store.snapshot()
+
+    if advance:
+        # Получаем и сдвигаем прогресс пользователя одной атомарной операцией
+        if sessions is None:
+            sessions = session_store
+        end_index = sessions.update(user_id, NEWS_CURSOR_FIELD, lambda offset: offset + items_per_page, default=0)
+        start_index = end_index - items_per_page
+    else:
+        start_index, end_index = 0, items_per_page
+
+    # Записи уже отформатированы при загрузке ленты
+    formatted_news = [entry.text for entry in all_entries[start_index:end_index]]
 
     if not formatted_news:
         return ["Больше новостей нет."]
 
     return formatted_news
+
+
+def fetch_news_since(user_id, sessions=None, limit=5, store=None):
+    """
+    Новости, появившиеся с прошлого такого запроса пользователя ("что нового").
+
+    При первом запросе выдаются последние новости, а все имеющиеся считаются
+    прочитанными. Дальше выдаются не больше limit новостей в порядке появления,
+    и отметка о прочитанном сдвигается только до последней показанной:
+    остальные придут при следующем запросе.
+
+    :param user_id: Идентификатор пользователя Telegram.
+    :param sessions: Хранилище состояния пользователей (по умолчанию общий session_store).
+    :param limit: Сколько новостей показать за раз.
+    :param store: Хранилище новостей (по умолчанию общий news_store).
+    :return: Список новостей.
+    """
+    if store is None:
+        store = news_store
+    if sessions is None:
+        sessions = session_store
+    # Загрузка ленты (возможно, с сетью) — до входа в атомарную операцию хранилища сессий
+    latest = store.snapshot()
+    shown = []
+    remaining = []
+
+    def mark_seen(cursor):
+        # Внутри — только бинарный поиск по готовому снимку и сдвиг отметки
+        if cursor is None:
+            shown[:] = latest[:limit]
+            arrivals = store.added_after(None)
+            return store.arrival_cursor(arrivals[-1]) if arrivals else None
+        fresh = store.added_after(cursor)
+        shown[:] = fresh[:limit][::-1]
+        remaining[:] = [len(fresh) - len(shown)]
+        return store.arrival_cursor(fresh[len(shown) - 1]) if shown else cursor
+
+    sessions.update(user_id, NEWS_SEEN_FIELD, mark_seen)
+
+    if not shown:
+        return ["Новых новостей нет."]
+
+    formatted_news = [entry.text for entry in shown]
+    if remaining and remaining[0]:
+        formatted_news.append(f"И еще новых новостей: {remaining[0]}. Напишите 'что нового' еще раз, чтобы их увидеть.")
+    return formatted_news
@@ -1,3 +1,6 @@
+from functions.upstream import upstreams
+
+
 
 
 
@@ -22,10 +25,77 @@ def _get_completion(client, prompt, model="gpt-4o-mini", max_tokens=500, tempera
     Simple method, which return answeer for the prompt by chatGpt
     """
     messages = [{"role": "user", "content": prompt}]
-    response = client.chat.completions.create(
-        model=model,
-        messages=messages,
-        temperature=temperature,
-        max_tokens=max_tokens,  
-    )
-    return response.choices[0].message.content
\ No newline at end of file
+    with upstreams['openai'].guard():
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    return response.choices[0].message.content
+
+async def summarize_text_async(text: str, client) -> str:
+    """
+    Async version of summarize_text.
+
+    Args:
+        client: AsyncOpenAI client object for making API calls.
+        text (str): The text to be summarized.
+
+    Returns:
+        str: The summary of the given text.
+    """
+    prompt = f"Please provide a concise summary of the following text:\n\n{text}"
+    summary = await _get_completion_async(client=client, prompt=prompt)
+    return summary
+
+
+async def _get_completion_async(client, prompt, model="gpt-4o-mini", max_tokens=500, temperature=0.7):
+    """
+    Async version of _get_completion, works with AsyncOpenAI client
+    """
+    messages = [{"role": "user", "content": prompt}]
+    with upstreams['openai'].guard():
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+        )
+    return response.choices[0].message.content
+
+
+def _stream_completion(client, prompt, model="gpt-4o-mini", max_tokens=500, temperature=0.7):
+    """
+    Streaming version of _get_completion, yields answer chunks as soon as they arrive
+    """
+    messages = [{"role": "user", "content": prompt}]
+    with upstreams['openai'].guard():
+        stream = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+async def _stream_completion_async(client, prompt, model="gpt-4o-mini", max_tokens=500, temperature=0.7):
+    """
+    Async version of _stream_completion, works with AsyncOpenAI client
+    """
+    messages = [{"role": "user", "content": prompt}]
+    with upstreams['openai'].guard():
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
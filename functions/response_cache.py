@@ -0,0 +1,127 @@
+import os
+import re
+import math
+import threading
+from collections import Counter
+from functions.cache import TTLCache
+
+RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 6 * 60 * 60))  # секунды
+RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 1000))
+# Порог косинусной близости для поиска похожих вопросов; 0 — только точное совпадение
+RESPONSE_CACHE_SIMILARITY = float(os.getenv('RESPONSE_CACHE_SIMILARITY', 0))
+
+_NON_WORD = re.compile(r'[^\w\s]+')
+
+
+def normalize_query(query):
+    """
+    Нормализация вопроса для ключа кэша: регистр, "ё", пунктуация и лишние пробелы.
+    """
+    query = _NON_WORD.sub(' ', query.lower().replace('ё', 'е'))
+    return ' '.join(query.split())
+
+
+def trigram_embedding(text):
+    """
+    Локальное "эмбеддинг"-представление текста: нормированный вектор
+    символьных триграмм. Не требует внешних моделей и сети.
+    """
+    padded = f"  {text} "
+    counts = Counter(padded[i:i + 3] for i in range(len(padded) - 2))
+    norm = math.sqrt(sum(count * count for count in counts.values())) or 1.0
+    return {trigram: count / norm for trigram, count in counts.items()}
+
+
+def cosine_similarity(left, right):
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(weight * right.get(key, 0.0) for key, weight in left.items())
+
+
+class ResponseCache:
+    """
+    Кэш ответов LLM на общие вопросы.
+
+    Ключ — нормализованный текст вопроса; при заданном similarity_threshold
+    дополнительно ищется похожий вопрос по локальному эмбеддингу. Записи
+    вытесняются по TTL и LRU, кэш очищается при изменении файла с данными.
+    """
+
+    def __init__(self, ttl=RESPONSE_CACHE_TTL, max_size=RESPONSE_CACHE_SIZE,
+                 similarity_threshold=RESPONSE_CACHE_SIMILARITY, embed=trigram_embedding, source_path=None):
+        """
+        :param ttl: Время жизни ответа, секунды.
+        :param max_size: Максимальное количество ответов.
+        :param similarity_threshold: Порог близости (0 < x <= 1) для семантического поиска; 0 — выключен.
+        :param embed: Функция, строящая разреженный вектор (dict) по нормализованному тексту.
+        :param source_path: Файл с данными; при его изменении кэш сбрасывается.
+        """
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self.source_path = source_path
+        self.hits = 0
+        self.misses = 0
+        self._cache = TTLCache(ttl=ttl, max_size=max_size)
+        self._source_version = self._read_source_version()
+        self._lock = threading.Lock()
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, query):
+        """
+        :return: Сохраненный ответ или None.
+        """
+        self._check_source()
+        key = normalize_query(query)
+        entry = self._cache.get(key)
+        if entry is None and self.similarity_threshold > 0:
+            entry = self._find_similar(key)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return entry[0]
+
+    def set(self, query, response):
+        key = normalize_query(query)
+        vector = self.embed(key) if self.similarity_threshold > 0 else None
+        self._cache.set(key, (response, vector))
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hit_rate}
+
+    def _find_similar(self, key):
+        vector = self.embed(key)
+        best, best_score = None, self.similarity_threshold
+        for _, entry in self._cache.items():
+            if entry[1] is None:
+                continue
+            score = cosine_similarity(vector, entry[1])
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _read_source_version(self):
+        if not self.source_path:
+            return None
+        try:
+            stat = os.stat(self.source_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _check_source(self):
+        if not self.source_path:
+            return
+        version = self._read_source_version()
+        if version != self._source_version:
+            self._source_version = version
+            self.clear()
@@ -0,0 +1,184 @@
+from collections import deque
+
+
+class Intent:
+    """
+    Описание намерения пользователя для IntentRouter.
+    """
+
+    def __init__(self, name, priority, triggers=(), exact=()):
+        """
+        :param name: Имя намерения.
+        :param priority: Приоритет; при нескольких совпадениях побеждает наибольший.
+        :param triggers: Список триггеров. Триггер — строка или кортеж строк,
+                         которые все должны встретиться в сообщении.
+        :param exact: Сообщения, которые должны совпасть с текстом целиком.
+        """
+        self.name = name
+        self.priority = priority
+        self.triggers = [tuple([trigger]) if isinstance(trigger, str) else tuple(trigger) for trigger in triggers]
+        self.exact = list(exact)
+
+    @property
+    def terms(self):
+        return {term for trigger in self.triggers for term in trigger}
+
+
+class _Automaton:
+    """
+    Автомат Ахо-Корасик: находит все вхождения набора фраз за один проход по тексту.
+    Стоимость прохода зависит от длины текста и числа совпадений, но не от числа фраз.
+    """
+
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+        for word in words:
+            self._insert(word)
+        self._build_failure_links()
+
+    def _insert(self, word):
+        state = 0
+        for char in word:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = next_state
+        self._output[state] = self._output[state] + (word,)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """
+        :return: Генератор кортежей (start, end, word) для каждого вхождения.
+        """
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for word in output[state]:
+                yield index - len(word) + 1, index + 1, word
+
+
+class IntentRouter:
+    """
+    Маршрутизатор сообщений: все триггеры компилируются в один автомат,
+    намерение определяется за один проход по тексту с явными приоритетами.
+    """
+
+    def __init__(self, intents, default='general'):
+        """
+        :param intents: Список объектов Intent.
+        :param default: Имя намерения, если ни один триггер не сработал.
+        """
+        self.default = default
+        self._exact = {}
+        self._term_triggers = {}  # term -> [(intent, frozenset(terms))]
+        for intent in intents:
+            self._register(intent)
+        self._compile()
+
+    def add(self, intent):
+        """
+        Регистрирует новое намерение и пересобирает автомат.
+        """
+        self._register(intent)
+        self._compile()
+
+    def _register(self, intent):
+        for text in intent.exact:
+            current = self._exact.get(text)
+            if current is None or intent.priority > current.priority:
+                self._exact[text] = intent
+        for trigger in intent.triggers:
+            for term in trigger:
+                self._term_triggers.setdefault(term, []).append((intent, frozenset(trigger)))
+
+    def _compile(self):
+        self._automaton = _Automaton(self._term_triggers)
+
+    def route(self, text):
+        """
+        Определение намерения по тексту сообщения (в нижнем регистре).
+
+        :param text: Текст сообщения.
+        :return: Кортеж (имя намерения, текст без ключевых слов этого намерения).
+        """
+        text = text.strip()
+        intent = self._exact.get(text)
+        if intent is not None:
+            return intent.name, ''
+
+        # Совпадения учитываются только с начала слова: "date" не срабатывает на "update"
+        spans = {}
+        for start, end, term in self._automaton.iter_matches(text):
+            if start == 0 or not text[start - 1].isalnum():
+                spans.setdefault(term, []).append((start, end))
+
+        best = None
+        for term in spans:
+            for intent, trigger in self._term_triggers[term]:
+                if (best is None or intent.priority > best.priority) and trigger <= spans.keys():
+                    best = intent
+
+        if best is None:
+            return self.default, text
+        return best.name, self._strip_terms(text, [span for term in best.terms & spans.keys() for span in spans[term]])
+
+    @staticmethod
+    def _strip_terms(text, spans):
+        # Вырезаем все найденные ключевые слова намерения (пересекающиеся фрагменты объединяются)
+        parts = []
+        position = 0
+        for start, end in sorted(spans):
+            if start > position:
+                parts.append(text[position:start])
+            position = max(position, end)
+        parts.append(text[position:])
+        return ''.join(parts).strip()
+
+
+# Намерения бота. Явные команды ("выполни команду", "найди") важнее слов,
+# которые могут оказаться частью запроса ("найди время работы музея").
+INTENTS = [
+    Intent('exit', priority=100, exact=['exit']),
+    Intent('execute command', priority=90, triggers=['выполни команду', 'execute']),
+    Intent('search and summarize', priority=80, triggers=['найди и саммаризуй', 'search and summarize']),
+    Intent('search', priority=70, triggers=['найди', 'поищи', 'search']),
+    Intent('sea temperature', priority=60, triggers=[
+        ('температура', 'моря'), ('температура', 'воды'), ('temperature', 'sea'), ('temperature', 'water'),
+    ]),
+    Intent('air temperature', priority=50, triggers=[
+        ('температура', 'воздуха'), ('температура', 'улице'), ('temperature', 'air'), ('temperature', 'outside'),
+    ]),
+    Intent('news unsubscribe', priority=47, triggers=[
+        ('отпис', 'новост'), ('отпиш', 'новост'), ('unsubscribe', 'news'), ('unsubscribe', 'digest'),
+    ]),
+    Intent('news subscribe', priority=46, triggers=[
+        ('подпис', 'новост'), ('подпиш', 'новост'), ('subscribe', 'news'), ('subscribe', 'digest'),
+    ]),
+    Intent('news since last read', priority=45, triggers=[
+        'что нового', ('новые', 'новости'), ('свежие', 'новости'), "what's new", 'whats new',
+    ]),
+    Intent('news', priority=40, triggers=['новости', 'news']),
+    Intent('time', priority=30, triggers=['время', 'date', 'datetime']),
+]
+
+intent_router = IntentRouter(INTENTS)
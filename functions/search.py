@@ -1,35 +1,202 @@
 import os
 import sys
-import requests
-import requests
-from bs4 import BeautifulSoup
-from functions.openai_wrappers import summarize_text
+import time
+import codecs
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, wait
+from html.parser import HTMLParser
+from functions.openai_wrappers import summarize_text, summarize_text_async
+from functions.upstream import upstreams
+from functions.cache import TTLCache, SQLiteTTLCache
+from functions.response_cache import normalize_query
 
 
-BING_SEARCH_ENDPOINT = "https://api.bing.microsoft.com/v7.0/search"
+BING_SEARCH_ENDPOINT = os.getenv('BING_SEARCH_ENDPOINT', "https://api.bing.microsoft.com/v7.0/search")
 
+ARTICLE_TEXT_LIMIT = 2000  # символов текста на статью
+ARTICLE_MAX_BYTES = 2 * 1024 * 1024  # не читаем больше этого, даже если текста не набралось
+ARTICLE_CHUNK_SIZE = 16 * 1024
+PAGES_DEADLINE = float(os.getenv('SEARCH_PAGES_DEADLINE', 8))  # общий дедлайн на загрузку всех страниц, секунды
+PAGES_FAILED_TEXT = "Не удалось получить содержание статьи."
+SEARCH_FAILED_LINKS = ["Ссылок не найдено."]
 
-def perform_internet_search(query, api_key, max_links=3):
+SEARCH_CACHE_TTL = int(os.getenv('SEARCH_CACHE_TTL', 6 * 60 * 60))  # секунды
+SEARCH_CACHE_SIZE = int(os.getenv('SEARCH_CACHE_SIZE', 1000))
+SEARCH_CACHE_DB = os.getenv('SEARCH_CACHE_DB', '')  # файл SQLite для сохранения кэша между перезапусками; пусто — только память
+
+_page_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SEARCH_PAGE_WORKERS', 10)), thread_name_prefix='page-fetch')
+
+
+def _make_search_cache():
+    if SEARCH_CACHE_DB:
+        try:
+            return SQLiteTTLCache(SEARCH_CACHE_DB, ttl=SEARCH_CACHE_TTL, max_size=SEARCH_CACHE_SIZE)
+        except Exception as e:
+            print(f"Ошибка при открытии кэша поиска {SEARCH_CACHE_DB}, используется кэш в памяти: {e}")
+    return TTLCache(ttl=SEARCH_CACHE_TTL, max_size=SEARCH_CACHE_SIZE)
+
+
+# Результаты Bing по нормализованному запросу; параллельные одинаковые запросы объединяются в один
+search_cache = _make_search_cache()
+
+
+class ArticleTextExtractor(HTMLParser):
     """
-    Выполнение интернет-поиска с использованием Bing Search API и возвращение ссылок.
+    Потоковое извлечение текста абзацев (<p>) из HTML.
+
+    HTML подается кусками через feed(); как только набрано больше limit
+    символов, флаг done становится True и дальше страницу можно не читать.
     """
+
+    def __init__(self, limit=ARTICLE_TEXT_LIMIT):
+        super().__init__(convert_charrefs=True)
+        self.limit = limit
+        self.done = False
+        self._paragraphs = []
+        self._length = 0
+        self._current = None
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ('script', 'style'):
+            self._skip_depth += 1
+        elif tag == 'p':
+            # Незакрытый абзац закрывается следующим <p>
+            self._flush()
+            self._current = []
+
+    def handle_endtag(self, tag):
+        if tag in ('script', 'style') and self._skip_depth:
+            self._skip_depth -= 1
+        elif tag == 'p':
+            self._flush()
+
+    def handle_data(self, data):
+        if self._current is not None and not self._skip_depth and not self.done:
+            self._current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        if self._current is None:
+            return
+        # Очистка текста от лишних пробелов и символов
+        paragraph = ' '.join(''.join(self._current).split())
+        self._current = None
+        if paragraph and not self.done:
+            self._paragraphs.append(paragraph)
+            self._length += len(paragraph) + 1
+            self.done = self._length > self.limit
+
+    def get_text(self):
+        """
+        Возвращает текст, обрезанный до limit символов.
+        """
+        text = ' '.join(self._paragraphs)
+        if len(text) > self.limit:
+            text = text[:self.limit] + "..."
+        return text
+
+
+def _charset_from_content_type(content_type):
+    for part in content_type.split(';')[1:]:
+        key, _, value = part.strip().partition('=')
+        if key.lower() == 'charset' and value:
+            return value.strip('"\'')
+    return 'utf-8'
+
+
+def _make_decoder(charset):
+    try:
+        return codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        return codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+
+def _format_search_results(search_results, max_links):
+    links = []
+    for web_page in search_results.get("webPages", {}).get("value", []):
+        links.append(f"- [{web_page.get('name')}]({web_page.get('url')})")
+        if len(links) == max_links:
+            break
+    return links
+
+
+def _search_cache_key(query, max_links):
+    return f"{max_links}:{normalize_query(query)}"
+
+
+def _extract_url(link):
+    # Извлечение URL из формата "- [Название](URL)"
+    start = link.find('(') + 1
+    end = link.find(')', start)
+    return link[start:end]
+
+
+def _combine_texts(texts):
+    # Добавление текста с разделителем
+    return "".join(f"text_{idx}: {text}\n\n" for idx, text in enumerate(texts, start=1))
+
+
+def _bing_search(query, api_key, max_links):
     headers = {"Ocp-Apim-Subscription-Key": api_key}
     params = {"q": query, "textDecorations": True, "textFormat": "HTML", "count": max_links}
+    response = upstreams['bing'].get(BING_SEARCH_ENDPOINT, headers=headers, params=params)
+    response.raise_for_status()
+    return _format_search_results(response.json(), max_links)
+
+
+def perform_internet_search(query, api_key, max_links=3):
+    """
+    Выполнение интернет-поиска с использованием Bing Search API и возвращение ссылок.
+    Результаты кэшируются по нормализованному запросу; ошибки не кэшируются.
+    """
     try:
-        response = requests.get(BING_SEARCH_ENDPOINT, headers=headers, params=params)
-        response.raise_for_status()
-        search_results = response.json()
-        links = []
-        for web_page in search_results.get("webPages", {}).get("value", []):
-            links.append(f"- [{web_page.get('name')}]({web_page.get('url')})")
-            if len(links) == max_links:
-                break
-        return links
+        links = search_cache.get_or_load(
+            _search_cache_key(query, max_links), lambda: _bing_search(query, api_key, max_links)
+        )
+        return list(links)
     except Exception as e:
         print(f"Ошибка при поиске в интернете: {e}")
-        return ["Ссылок не найдено."]
+        return list(SEARCH_FAILED_LINKS)
+
+
+def _fetch_article_text(link, deadline):
+    try:
+        url = _extract_url(link)
+        timeout = max(deadline - time.monotonic(), 0.1)
+
+        # Читаем страницу потоком, пока не наберется нужный объем текста
+        pages = upstreams['pages']
+        with pages.guard(), pages.session.get(url, timeout=timeout, stream=True) as page_response:
+            page_response.raise_for_status()
+            decoder = _make_decoder(_charset_from_content_type(page_response.headers.get('Content-Type', '')))
+            extractor = ArticleTextExtractor()
+            received = 0
+            for chunk in page_response.iter_content(chunk_size=ARTICLE_CHUNK_SIZE):
+                extractor.feed(decoder.decode(chunk))
+                received += len(chunk)
+                if extractor.done or received >= ARTICLE_MAX_BYTES or time.monotonic() >= deadline:
+                    break
+        extractor.close()
+        return extractor.get_text()
+    except Exception as e:
+        print(f"Ошибка при обработке ссылки {link}: {e}")
+        return PAGES_FAILED_TEXT
 
 
+def _fetch_article_texts(links, timeout=PAGES_DEADLINE):
+    """
+    Параллельная загрузка текстов статей с общим дедлайном.
+    Страницы, не успевшие загрузиться к дедлайну, заменяются заглушкой.
+    """
+    deadline = time.monotonic() + timeout
+    futures = [_page_executor.submit(_fetch_article_text, link, deadline) for link in links]
+    wait(futures, timeout=timeout)
+    return [future.result() if future.done() else PAGES_FAILED_TEXT for future in futures]
+
 
 def search_and_summarize(query, bing_api_key, openai_client, max_links=3):
     """
@@ -45,42 +212,93 @@ def search_and_summarize(query, bing_api_key, openai_client, max_links=3):
                  "summary": "Краткое резюме всех статей."
              }
     """
-    combined_text = ""
     links = perform_internet_search(query, bing_api_key, max_links)
+    texts = _fetch_article_texts(links)
 
-    for idx, link in enumerate(links, start=1):
-        try:
-            # Извлечение URL из формата "- [Название](URL)"
-            start = link.find('(') + 1
-            end = link.find(')', start)
-            url = link[start:end]
+    # Суммаризация объединенного текста
+    summary = summarize_text(_combine_texts(texts), openai_client)
 
-            # Запрос к странице
-            page_response = requests.get(url, timeout=10)
-            page_response.raise_for_status()
+    return {"links": links, "summary": summary}
 
-            # Парсинг HTML контента
-            soup = BeautifulSoup(page_response.text, 'html.parser')
 
-            # Извлечение основного текста статьи
-            paragraphs = soup.find_all('p')
-            text = ' '.join([para.get_text() for para in paragraphs])
+async def _bing_search_async(query, api_key, session, max_links):
+    headers = {"Ocp-Apim-Subscription-Key": api_key}
+    params = {"q": query, "textDecorations": "true", "textFormat": "HTML", "count": max_links}
 
-            # Очистка текста от лишних пробелов и символов
-            text = ' '.join(text.split())
+    async def fetch():
+        async with session.get(BING_SEARCH_ENDPOINT, headers=headers, params=params) as response:
+            response.raise_for_status()
+            return await response.json()
 
-            # Ограничение длины текста для суммаризации (например, 2000 символов на статью)
-            if len(text) > 2000:
-                text = text[:2000] + "..."
+    return _format_search_results(await upstreams['bing'].acall(fetch), max_links)
 
-            # Добавление текста с разделителем
-            combined_text += f"text_{idx}: {text}\n\n"
 
-        except Exception as e:
-            print(f"Ошибка при обработке ссылки {link}: {e}")
-            combined_text += f"text_{idx}: Не удалось получить содержание статьи.\n\n"
+async def perform_internet_search_async(query, api_key, session, max_links=3):
+    """
+    Асинхронная версия perform_internet_search.
+
+    :param session: Общая aiohttp.ClientSession.
+    """
+    try:
+        links = await search_cache.aget_or_load(
+            _search_cache_key(query, max_links), lambda: _bing_search_async(query, api_key, session, max_links)
+        )
+        return list(links)
+    except Exception as e:
+        print(f"Ошибка при поиске в интернете: {e}")
+        return list(SEARCH_FAILED_LINKS)
+
+
+async def _fetch_article_text_async(link, session):
+    try:
+        url = _extract_url(link)
+        with upstreams['pages'].guard():
+            async with session.get(url) as page_response:
+                page_response.raise_for_status()
+                decoder = _make_decoder(page_response.charset or 'utf-8')
+                extractor = ArticleTextExtractor()
+                received = 0
+                async for chunk in page_response.content.iter_chunked(ARTICLE_CHUNK_SIZE):
+                    extractor.feed(decoder.decode(chunk))
+                    received += len(chunk)
+                    if extractor.done or received >= ARTICLE_MAX_BYTES:
+                        break
+        extractor.close()
+        return extractor.get_text()
+    except Exception as e:
+        print(f"Ошибка при обработке ссылки {link}: {e}")
+        return PAGES_FAILED_TEXT
+
+
+async def _fetch_article_texts_async(links, session, timeout=PAGES_DEADLINE):
+    """
+    Асинхронная версия _fetch_article_texts: страницы, не успевшие к дедлайну, отменяются.
+    """
+    tasks = [asyncio.create_task(_fetch_article_text_async(link, session)) for link in links]
+    if not tasks:
+        return []
+    await asyncio.wait(tasks, timeout=timeout)
+    texts = []
+    for task in tasks:
+        if task.done():
+            texts.append(task.result())
+        else:
+            task.cancel()
+            texts.append(PAGES_FAILED_TEXT)
+    return texts
+
+
+async def search_and_summarize_async(query, bing_api_key, openai_client, session, max_links=3):
+    """
+    Асинхронная версия search_and_summarize.
+
+    :param openai_client: Асинхронный клиент OpenAI (AsyncOpenAI).
+    :param session: Общая aiohttp.ClientSession.
+    """
+    links = await perform_internet_search_async(query, bing_api_key, session, max_links)
+    texts = await _fetch_article_texts_async(links, session)
 
     # Суммаризация объединенного текста
-    summary = summarize_text(combined_text, openai_client)
+    summary = await summarize_text_async(_combine_texts(texts), openai_client)
 
-    return {"links": links, "summary": summary}
\ No newline at end of file
+    return {"links": links, "summary": summary}
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from functions.cache import TTLCache
+
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')  # memory или sqlite
+SESSION_DB = os.getenv('SESSION_DB', 'sessions.sqlite3')
+SESSION_TTL = int(os.getenv('SESSION_TTL', 7 * 24 * 60 * 60))  # секунды без активности, после которых состояние забывается
+SESSION_MAX_USERS = int(os.getenv('SESSION_MAX_USERS', 10000))  # только для memory
+
+
+class SessionStore:
+    """
+    Хранилище состояния пользователей: пары (user_id, field) -> значение.
+
+    Значения должны сериализоваться в JSON. update() выполняет
+    чтение-изменение-запись атомарно, поэтому параллельные сообщения
+    одного пользователя не теряют изменения.
+    """
+
+    def get(self, user_id, field, default=None):
+        raise NotImplementedError
+
+    def set(self, user_id, field, value):
+        raise NotImplementedError
+
+    def update(self, user_id, field, func, default=None):
+        """
+        Атомарно заменяет значение на func(текущее значение) и возвращает новое.
+
+        :param func: Функция от текущего значения (default, если его нет).
+        """
+        raise NotImplementedError
+
+    def delete(self, user_id, field=None):
+        """
+        Удаляет одно поле или, если field не задан, все состояние пользователя.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Хранилище в памяти процесса: пользователи вытесняются по TTL и LRU.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_users=SESSION_MAX_USERS):
+        """
+        :param ttl: Время жизни состояния без активности, секунды.
+        :param max_users: Максимальное количество пользователей в памяти.
+        """
+        self._sessions = TTLCache(ttl=ttl, max_size=max_users)  # user_id -> {field: value}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, user_id, field, default=None):
+        session = self._sessions.get(user_id)
+        return default if session is None else session.get(field, default)
+
+    def set(self, user_id, field, value):
+        self.update(user_id, field, lambda _: value)
+
+    def update(self, user_id, field, func, default=None):
+        with self._lock:
+            session = dict(self._sessions.get(user_id) or {})
+            session[field] = func(session.get(field, default))
+            # Запись продлевает время жизни состояния
+            self._sessions.set(user_id, session)
+            return session[field]
+
+    def delete(self, user_id, field=None):
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return
+            if field is None:
+                self._sessions.delete(user_id)
+            else:
+                self._sessions.set(user_id, {key: value for key, value in session.items() if key != field})
+
+
+class SQLiteSessionStore(SessionStore):
+    """
+    Хранилище в файле SQLite: переживает перезапуск и общее для нескольких
+    процессов бота на одной машине (режим WAL, транзакции BEGIN IMMEDIATE).
+    """
+
+    # Как часто (в записях) удалять устаревшие состояния
+    PURGE_EVERY = 1000
+
+    def __init__(self, path=SESSION_DB, ttl=SESSION_TTL):
+        """
+        :param path: Путь к файлу SQLite.
+        :param ttl: Время жизни состояния без активности, секунды.
+        """
+        self.ttl = ttl
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "user_id TEXT NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL, updated_at REAL NOT NULL, "
+            "PRIMARY KEY (user_id, field))"
+        )
+        self._purge()
+
+    def get(self, user_id, field, default=None):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value FROM sessions WHERE user_id = ? AND field = ? AND updated_at >= ?",
+                (str(user_id), field, time.time() - self.ttl),
+            ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, user_id, field, value):
+        self.update(user_id, field, lambda _: value)
+
+    def update(self, user_id, field, func, default=None):
+        with self._lock:
+            now = time.time()
+            # BEGIN IMMEDIATE блокирует запись для других процессов до конца транзакции
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT value FROM sessions WHERE user_id = ? AND field = ? AND updated_at >= ?",
+                    (str(user_id), field, now - self.ttl),
+                ).fetchone()
+                value = func(default if row is None else json.loads(row[0]))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO sessions (user_id, field, value, updated_at) VALUES (?, ?, ?, ?)",
+                    (str(user_id), field, json.dumps(value, ensure_ascii=False), now),
+                )
+                # Активность продлевает время жизни всего состояния пользователя
+                self._db.execute("UPDATE sessions SET updated_at = ? WHERE user_id = ?", (now, str(user_id)))
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge()
+        return value
+
+    def delete(self, user_id, field=None):
+        with self._lock:
+            if field is None:
+                self._db.execute("DELETE FROM sessions WHERE user_id = ?", (str(user_id),))
+            else:
+                self._db.execute("DELETE FROM sessions WHERE user_id = ? AND field = ?", (str(user_id), field))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _purge(self):
+        try:
+            with self._lock:
+                self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+        except Exception as e:
+            print(f"Ошибка при очистке устаревших сессий: {e}")
+
+
+def make_session_store(kind=SESSION_STORE):
+    """
+    Создание хранилища по настройке SESSION_STORE.
+
+    :param kind: 'memory' или 'sqlite'.
+    """
+    if kind == 'sqlite':
+        return SQLiteSessionStore()
+    if kind != 'memory':
+        print(f"Неизвестный тип хранилища сессий {kind}, используется memory")
+    return MemorySessionStore()
+
+
+session_store = make_session_store()
@@ -0,0 +1,180 @@
+import os
+import time
+import asyncio
+import threading
+from functions.metrics import track_upstream
+
+# Telegram ограничивает частоту редактирования сообщений, поэтому правки не чаще раза в интервал
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.0))  # секунды
+STREAM_PLACEHOLDER = "Думаю..."
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def split_message(text, limit=TELEGRAM_MESSAGE_LIMIT):
+    """
+    Разбиение длинного текста на части, которые помещаются в одно сообщение Telegram.
+    """
+    return [text[i:i + limit] for i in range(0, len(text), limit)] or [text]
+
+
+class StreamingReply:
+    """
+    Ответ, который показывается пользователю по мере генерации.
+
+    Сначала отправляется сообщение-заглушка, затем оно редактируется
+    накопленным текстом не чаще, чем раз в min_interval секунд.
+
+    push, status и finish выполняются под блокировкой: генерация, не успевшая
+    к дедлайну, не может перезаписать окончательный ответ своей правкой.
+    """
+
+    def __init__(self, bot, message, min_interval=STREAM_EDIT_INTERVAL, placeholder=STREAM_PLACEHOLDER):
+        """
+        :param bot: Экземпляр telebot.TeleBot.
+        :param message: Сообщение пользователя, на которое отвечаем.
+        :param min_interval: Минимальный интервал между правками, секунды.
+        :param placeholder: Текст заглушки до появления первых токенов.
+        """
+        self.bot = bot
+        self.message = message
+        self.min_interval = min_interval
+        self.placeholder = placeholder
+        self.text = ''
+        self.started_at = time.monotonic()
+        self.first_token_at = None
+        self._sent = None
+        self._shown = ''
+        self._edited_at = 0.0
+        self._finished = False
+        self._lock = threading.Lock()
+
+    @property
+    def time_to_first_token(self):
+        """
+        Время от начала ответа до первого показанного токена, секунды (None, если токенов не было).
+        """
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.started_at
+
+    def start(self):
+        with track_upstream('telegram'):
+            self._sent = self.bot.reply_to(self.message, self.placeholder)
+        self._shown = self.placeholder
+
+    def status(self, text):
+        """
+        Показывает служебный текст (например, позицию в очереди), пока не пришли токены ответа.
+        """
+        with self._lock:
+            if self._finished:
+                return
+            if self._sent is None:
+                self.start()
+            if self.first_token_at is None:
+                self._edit(text)
+
+    def push(self, delta):
+        """
+        Добавляет очередной фрагмент текста и, если пора, обновляет сообщение.
+        После finish() фрагменты игнорируются (например, генерация не успела к дедлайну).
+        """
+        with self._lock:
+            if self._finished:
+                return
+            self.text += delta
+            if self._sent is None:
+                self.start()
+            if self.first_token_at is None:
+                self._edit(self.text)
+                self.first_token_at = time.monotonic()
+            elif time.monotonic() - self._edited_at >= self.min_interval:
+                self._edit(self.text)
+
+    def finish(self, final_text):
+        """
+        Показывает окончательный текст; не поместившееся в одно сообщение отправляется следом.
+        """
+        # Дожидаемся правки, которая уже идет, и запрещаем следующие
+        with self._lock:
+            self._finished = True
+            parts = split_message(final_text)
+            if self._sent is None:
+                self.start()
+            self._edit(parts[0])
+        for part in parts[1:]:
+            with track_upstream('telegram'):
+                self.bot.send_message(self.message.chat.id, part)
+
+    def _edit(self, text):
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if not text.strip() or text == self._shown:
+            return
+        try:
+            with track_upstream('telegram'):
+                self.bot.edit_message_text(text, chat_id=self._sent.chat.id, message_id=self._sent.message_id)
+            self._shown = text
+        except Exception as e:
+            # Например, 429 Too Many Requests: следующая правка покажет накопленный текст
+            print(f"Ошибка при обновлении сообщения: {e}")
+        self._edited_at = time.monotonic()
+
+
+class AsyncStreamingReply(StreamingReply):
+    """
+    Версия StreamingReply для telebot.async_telebot.AsyncTeleBot.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        with track_upstream('telegram'):
+            self._sent = await self.bot.reply_to(self.message, self.placeholder)
+        self._shown = self.placeholder
+
+    async def status(self, text):
+        async with self._lock:
+            if self._finished:
+                return
+            if self._sent is None:
+                await self.start()
+            if self.first_token_at is None:
+                await self._edit(text)
+
+    async def push(self, delta):
+        async with self._lock:
+            if self._finished:
+                return
+            self.text += delta
+            if self._sent is None:
+                await self.start()
+            if self.first_token_at is None:
+                await self._edit(self.text)
+                self.first_token_at = time.monotonic()
+            elif time.monotonic() - self._edited_at >= self.min_interval:
+                await self._edit(self.text)
+
+    async def finish(self, final_text):
+        async with self._lock:
+            self._finished = True
+            parts = split_message(final_text)
+            if self._sent is None:
+                await self.start()
+            await self._edit(parts[0])
+        for part in parts[1:]:
+            with track_upstream('telegram'):
+                await self.bot.send_message(self.message.chat.id, part)
+
+    async def _edit(self, text):
+        text = text[:TELEGRAM_MESSAGE_LIMIT]
+        if not text.strip() or text == self._shown:
+            return
+        try:
+            with track_upstream('telegram'):
+                await self.bot.edit_message_text(text, chat_id=self._sent.chat.id, message_id=self._sent.message_id)
+            self._shown = text
+        except Exception as e:
+            print(f"Ошибка при обновлении сообщения: {e}")
+        self._edited_at = time.monotonic()
@@ -0,0 +1,260 @@
+import os
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from functions.metrics import Counter, track_upstream
+
+UPSTREAM_POOL_SIZE = int(os.getenv('UPSTREAM_POOL_SIZE', 20))  # keep-alive соединений на хост
+UPSTREAM_RETRY_BUDGET = float(os.getenv('UPSTREAM_RETRY_BUDGET', 0.2))  # доля повторов от числа запросов
+UPSTREAM_BACKOFF = 0.2  # базовая пауза перед повтором, секунды
+UPSTREAM_MAX_BACKOFF = 2.0
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', 5))  # ошибок подряд до размыкания
+CIRCUIT_RESET_TIMEOUT = float(os.getenv('CIRCUIT_RESET_TIMEOUT', 30))  # секунды до пробного запроса
+
+# Таймаут одной попытки (секунды) и число повторов по умолчанию; переопределяются
+# переменными <ИМЯ>_TIMEOUT и <ИМЯ>_RETRIES, например BING_TIMEOUT=3
+UPSTREAM_DEFAULTS = {
+    'bing': (5.0, 2),
+    'openweathermap': (5.0, 2),
+    'rss': (10.0, 1),
+    'pages': (8.0, 0),  # у загрузки страниц свой общий дедлайн
+    'openai': (60.0, 0),  # повторы выполняет клиент OpenAI
+}
+# Страницы статей — разные сайты: отказ одного ничего не говорит о других
+UPSTREAMS_WITHOUT_BREAKER = ('pages',)
+
+UPSTREAM_RETRIES = Counter('bot_upstream_retries_total', 'Повторные запросы к внешним сервисам', ['upstream'])
+CIRCUIT_OPENED = Counter('bot_upstream_circuit_opened_total', 'Размыкания предохранителя внешнего сервиса', ['upstream'])
+CIRCUIT_REJECTED = Counter('bot_upstream_circuit_rejected_total', 'Запросы, отклоненные разомкнутым предохранителем', ['upstream'])
+
+
+class UpstreamUnavailable(Exception):
+    """
+    Внешний сервис считается недоступным (предохранитель разомкнут).
+    """
+
+
+def is_retryable(error):
+    """
+    Стоит ли повторять запрос и считать ошибку отказом сервиса:
+    сетевые ошибки, таймауты, HTTP 429 и 5xx. Ошибки 4xx — проблема запроса, а не сервиса.
+    """
+    response = getattr(error, 'response', None)
+    status = getattr(error, 'status', None) or getattr(error, 'status_code', None) or getattr(response, 'status_code', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    if isinstance(error, (OSError, TimeoutError, asyncio.TimeoutError)):
+        return True
+    # aiohttp.ClientConnectionError и сетевые ошибки клиента OpenAI не наследуются от OSError
+    return any(cls.__name__ in ('ClientConnectionError', 'APIConnectionError', 'APITimeoutError') for cls in type(error).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold отказов подряд запросы к сервису
+    сразу отклоняются в течение reset_timeout секунд, затем пропускается
+    один пробный запрос. Успех замыкает предохранитель, отказ — снова размыкает.
+    """
+
+    def __init__(self, name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD, reset_timeout=CIRCUIT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return 'open'
+        return 'half-open'
+
+    def before_call(self):
+        """
+        :raises UpstreamUnavailable: Если предохранитель разомкнут или пробный запрос уже идет.
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return
+        CIRCUIT_REJECTED.inc(upstream=self.name)
+        raise UpstreamUnavailable(f"{self.name} временно недоступен")
+
+    def after_call(self, failed):
+        """
+        :param failed: True — отказ сервиса, False — успех, None — вызов прерван (не учитывается).
+        """
+        with self._lock:
+            trial, self._trial = self._trial, False
+            if failed is None:
+                return
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if trial or (self.opened_at is None and self.failures >= self.failure_threshold):
+                if self.opened_at is None or trial:
+                    CIRCUIT_OPENED.inc(upstream=self.name)
+                self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """
+    Бюджет повторов: каждый запрос пополняет его на ratio, каждый повтор
+    тратит единицу. При массовых отказах повторы не умножают нагрузку
+    на сервис больше чем на ratio.
+    """
+
+    def __init__(self, ratio=UPSTREAM_RETRY_BUDGET, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = float(max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class Upstream:
+    """
+    Клиент внешнего сервиса: пул keep-alive соединений, таймаут попытки,
+    повторы с джиттером в пределах бюджета и предохранитель.
+    """
+
+    def __init__(self, name, timeout, retries, pool_size=UPSTREAM_POOL_SIZE, use_breaker=True):
+        """
+        :param name: Имя сервиса (метка в метриках).
+        :param timeout: Таймаут одной попытки, секунды.
+        :param retries: Сколько раз повторять неудачный запрос.
+        :param pool_size: Keep-alive соединений на хост.
+        :param use_breaker: Использовать ли предохранитель.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.breaker = CircuitBreaker(name) if use_breaker else None
+        self.budget = RetryBudget()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @contextmanager
+    def guard(self):
+        """
+        Одна попытка обращения к сервису: проверка предохранителя, метрики и учет результата.
+        Подходит и для асинхронного кода, и для потоковых ответов.
+        """
+        if self.breaker is not None:
+            self.breaker.before_call()
+        failed = None
+        try:
+            with track_upstream(self.name):
+                yield
+            failed = False
+        except Exception as e:
+            failed = is_retryable(e)
+            raise
+        finally:
+            if self.breaker is not None:
+                self.breaker.after_call(failed)
+
+    def call(self, func):
+        """
+        Выполняет func() с повторами.
+
+        :param func: Функция без аргументов, выполняющая запрос; ошибка — исключение.
+        :raises UpstreamUnavailable: Если предохранитель разомкнут.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                with self.guard():
+                    return func()
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            time.sleep(self._backoff(attempt))
+            attempt += 1
+
+    async def acall(self, func):
+        """
+        Асинхронная версия call: func() возвращает корутину, каждая попытка ограничена таймаутом.
+        """
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            try:
+                with self.guard():
+                    return await asyncio.wait_for(func(), self.timeout)
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+            await asyncio.sleep(self._backoff(attempt))
+            attempt += 1
+
+    def request(self, method, url, **kwargs):
+        """
+        HTTP-запрос через пул соединений сервиса с таймаутом и повторами.
+        Ответы 429 и 5xx считаются ошибкой и повторяются.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+
+        def send():
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            return response
+
+        return self.call(send)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def _should_retry(self, error, attempt):
+        if isinstance(error, UpstreamUnavailable) or attempt >= self.retries or not is_retryable(error):
+            return False
+        if not self.budget.withdraw():
+            return False
+        UPSTREAM_RETRIES.inc(upstream=self.name)
+        return True
+
+    @staticmethod
+    def _backoff(attempt):
+        # "Полный джиттер": случайная пауза от 0 до экспоненциально растущего предела
+        return random.uniform(0, min(UPSTREAM_MAX_BACKOFF, UPSTREAM_BACKOFF * 2 ** attempt))
+
+
+def _setting(name, index, default):
+    value = os.getenv(f"{name.upper()}_{('TIMEOUT', 'RETRIES')[index]}")
+    return type(default)(value) if value else default
+
+
+upstreams = {
+    name: Upstream(
+        name, timeout=_setting(name, 0, timeout), retries=_setting(name, 1, retries),
+        use_breaker=name not in UPSTREAMS_WITHOUT_BREAKER,
+    )
+    for name, (timeout, retries) in UPSTREAM_DEFAULTS.items()
+}
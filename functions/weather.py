@@ -0,0 +1,125 @@
+import os
+from functions.cache import TTLCache
+from functions.upstream import upstreams
+
+WEATHER_API_URL = os.getenv('WEATHER_API_URL', "https://api.openweathermap.org/data/2.5/weather")
+# https://api.openweathermap.org/data/2.5/weather?q=${city}&units=metric&appid={YOUR_API_KEY}
+
+# Координаты Пафоса, Кипр
+PAPHOS_LATITUDE = 34.7757
+PAPHOS_LONGITUDE = 32.4243
+
+WEATHER_CACHE_TTL = int(os.getenv('WEATHER_CACHE_TTL', 600))  # секунды
+WEATHER_STALE_TTL = int(os.getenv('WEATHER_STALE_TTL', 3600))  # сколько еще отдавать устаревшие данные, пока идет обновление
+WEATHER_CACHE_KEY = 'paphos'
+
+# Один ответ /weather используется и для температуры моря, и для температуры воздуха
+weather_cache = TTLCache(ttl=WEATHER_CACHE_TTL, stale_ttl=WEATHER_STALE_TTL)
+
+
+def _weather_params(api_key):
+    return {
+        'lat': PAPHOS_LATITUDE,
+        'lon': PAPHOS_LONGITUDE,
+        'appid': api_key,
+        'units': 'metric'
+    }
+
+
+def _format_sea_temperature(weather_data):
+    # Предполагается, что 'main.temp' предоставляет температуру морской воды; возможно, потребуется корректировка
+    temperature = weather_data['main']['temp']
+    return f"Текущая температура морской воды в Пафосе составляет {temperature}°C."
+
+
+def _format_air_temperature(weather_data):
+    temperature = weather_data['main']['temp']
+    return f"Текущая температура воздуха в Пафосе составляет {temperature}°C."
+
+
+def fetch_weather(api_key):
+    """
+    Запрос текущей погоды в Пафосе к OpenWeatherMap API (без кэша).
+    """
+    response = upstreams['openweathermap'].get(WEATHER_API_URL, params=_weather_params(api_key))
+    response.raise_for_status()
+    return response.json()
+
+
+def get_weather(api_key):
+    """
+    Текущая погода в Пафосе из кэша; при промахе — один общий запрос к API.
+    Пока сервис недоступен, устаревшее значение отдается сразу (в пределах WEATHER_STALE_TTL).
+    """
+    return weather_cache.get_or_load(WEATHER_CACHE_KEY, lambda: fetch_weather(api_key))
+
+
+def get_sea_water_temperature(api_key):
+    """
+    Получение текущей температуры морской воды в Пафосе с использованием OpenWeatherMap API.
+    """
+    try:
+        return _format_sea_temperature(get_weather(api_key))
+    except Exception as e:
+        print(f"Ошибка при получении температуры морской воды: {e}")
+        return "Не удалось получить температуру морской воды в данный момент."
+
+
+def get_air_temperature(api_key):
+    """
+    Получение текущей температуры воздуха в Пафосе с использованием OpenWeatherMap API.
+    """
+    try:
+        return _format_air_temperature(get_weather(api_key))
+    except Exception as e:
+        print(f"Ошибка при получении температуры воздуха: {e}")
+        return "Не удалось получить температуру воздуха в данный момент."
+
+
+async def fetch_weather_async(api_key, session):
+    """
+    Асинхронная версия fetch_weather.
+
+    :param session: Общая aiohttp.ClientSession.
+    """
+    async def fetch():
+        async with session.get(WEATHER_API_URL, params=_weather_params(api_key)) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    return await upstreams['openweathermap'].acall(fetch)
+
+
+async def get_weather_async(api_key, session):
+    """
+    Асинхронная версия get_weather.
+    """
+    return await weather_cache.aget_or_load(WEATHER_CACHE_KEY, lambda: fetch_weather_async(api_key, session))
+
+
+async def get_sea_water_temperature_async(api_key, session):
+    """
+    Асинхронная версия get_sea_water_temperature.
+
+    :param api_key: API-ключ OpenWeatherMap.
+    :param session: Общая aiohttp.ClientSession.
+    """
+    try:
+        return _format_sea_temperature(await get_weather_async(api_key, session))
+    except Exception as e:
+        print(f"Ошибка при получении температуры морской воды: {e}")
+        return "Не удалось получить температуру морской воды в данный момент."
+
+
+async def get_air_temperature_async(api_key, session):
+    """
+    Асинхронная версия get_air_temperature.
+
+    :param api_key: API-ключ OpenWeatherMap.
+    :param session: Общая aiohttp.ClientSession.
+    """
+    try:
+        return _format_air_temperature(await get_weather_async(api_key, session))
+    except Exception as e:
+        print(f"Ошибка при получении температуры воздуха: {e}")
+        return "Не удалось получить температуру воздуха в данный момент."
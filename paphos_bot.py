@@ -1,19 +1,24 @@
-import json
 import os
-import requests
+import math
 import datetime
-import subprocess
-import shlex
-import logging
-from logging.handlers import RotatingFileHandler
-from bs4 import BeautifulSoup
+import threading
+from concurrent.futures import Future
 from dotenv import load_dotenv
 import telebot
-import openai
-from openai import OpenAI
-from functions.news import fetch_latest_news
+from functions.news import fetch_latest_news, fetch_news_since, news_store
+from functions.digest import NewsDigest, news_subscribers
 from functions.search import perform_internet_search, search_and_summarize
-from utils import setup_logger, log_user_action
+from functions.weather import get_sea_water_temperature, get_air_temperature
+from functions.openai_wrappers import _get_completion, _stream_completion
+from functions.router import intent_router
+from functions.response_cache import ResponseCache
+from functions.knowledge_base import KnowledgeBase
+from functions.streaming import StreamingReply
+from functions.fanout import Source, fan_out
+from functions.jobs import JobScheduler, JobRejected, RateLimited
+from functions.upstream import upstreams
+from functions.metrics import Gauge, TIME_TO_FIRST_TOKEN, track_handler, track_stage, track_upstream, start_metrics_server
+from utils import setup_logger, log_user_action, preview
 
 # Initialize the logger
 load_dotenv()
@@ -23,72 +28,42 @@ BING_API_KEY = os.getenv('BING_API_KEY')
 TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 WEATHER_API_KEY = os.getenv('WEATHER_API_KEY')
+# Адрес Bot API можно переопределить (локальный Bot API сервер или заглушка в бенчмарках)
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL')
 
 # Разрешенные системные команды
 ALLOWED_COMMANDS = ['echo', 'date', 'uptime']  # Пример разрешенных команд
-user_news_progress = {}
+DATA_FILE = 'data.json'
+GENERATION_FAILED_TEXT = "Извините, не удалось обработать ваш запрос в данный момент."
+QUEUED_TEXT = "Запрос в очереди, позиция {position}. Ответ придет, как только подойдет очередь."
+# Показывать ответ LLM по мере генерации, редактируя сообщение
+STREAM_REPLIES = os.getenv('STREAM_REPLIES', '1') == '1'
+# Дедлайны источников общего ответа (запускаются одновременно), секунды
+GENERAL_LLM_DEADLINE = float(os.getenv('GENERAL_LLM_DEADLINE', 30))
+GENERAL_SEARCH_DEADLINE = float(os.getenv('GENERAL_SEARCH_DEADLINE', 5))
+GENERAL_NEWS_DEADLINE = float(os.getenv('GENERAL_NEWS_DEADLINE', 2))
+
+# База знаний о городе индексируется при первом вопросе и перечитывается при изменении data.json
+knowledge_base = KnowledgeBase(DATA_FILE, lazy=True)
+# Кэш ответов на общие вопросы, сбрасывается при изменении data.json
+response_cache = ResponseCache(source_path=DATA_FILE)
+Gauge('bot_response_cache_hit_ratio', 'Доля общих вопросов, ответ на которые взят из кэша', lambda: response_cache.hit_rate)
+Gauge('bot_news_entries', 'Количество новостей в общем кэше', lambda: len(news_store))
+Gauge('bot_news_subscribers', 'Подписчики дайджеста новостей', lambda: len(news_subscribers))
+# Тяжелые задачи (LLM, поиск с суммаризацией): лимит на пользователя, общий лимит параллельности и очередь
+job_scheduler = JobScheduler()
 
 # Инициализация бота
+if TELEGRAM_API_URL:
+    telebot.apihelper.API_URL = TELEGRAM_API_URL
 bot = telebot.TeleBot(TELEGRAM_TOKEN)
 
-def load_data(file_path):
-    """
-    Загрузка данных из JSON файла.
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        print(f"Ошибка при загрузке {file_path}: {e}")
-        return {}
+def send_digest_message(chat_id, text):
+    with track_upstream('telegram'):
+        bot.send_message(chat_id, text)
 
-def get_sea_water_temperature():
-    """
-    Получение текущей температуры морской воды в Пафосе с использованием OpenWeatherMap API.
-    """
-    try:
-        # Координаты Пафоса, Кипр
-        latitude = 34.7757
-        longitude = 32.4243
-        params = {
-            'lat': latitude,
-            'lon': longitude,
-            'appid': WEATHER_API_KEY,
-            'units': 'metric'
-        }
-        SEA_TEMPERATURE_API_URL = "https://api.openweathermap.org/data/2.5/weather"
-        # https://api.openweathermap.org/data/2.5/weather?q=${city}&units=metric&appid={YOUR_API_KEY}
-        response = requests.get(SEA_TEMPERATURE_API_URL, params=params)
-        response.raise_for_status()
-        weather_data = response.json()
-        # Предполагается, что 'main.temp' предоставляет температуру морской воды; возможно, потребуется корректировка
-        temperature = weather_data['main']['temp']
-        return f"Текущая температура морской воды в Пафосе составляет {temperature}°C."
-    except Exception as e:
-        print(f"Ошибка при получении температуры морской воды: {e}")
-        return "Не удалось получить температуру морской воды в данный момент."
-    
-def get_air_temperature():
-    """
-    Получение текущей температуры воздуха в Пафосе с использованием OpenWeatherMap API.
-    """
-    try:
-        params = {
-            'q': 'paphos',
-            'appid': WEATHER_API_KEY,
-            'units': 'metric'
-        }
-        SEA_TEMPERATURE_API_URL = "https://api.openweathermap.org/data/2.5/weather"
-        response = requests.get(SEA_TEMPERATURE_API_URL, params=params)
-        response.raise_for_status()
-        weather_data = response.json()
-        # Предполагается, что 'main.temp' предоставляет температуру морской воды; возможно, потребуется корректировка
-        temperature = weather_data['main']['temp']
-        return f"Текущая температура воздуха в Пафосе составляет {temperature}°C."
-    except Exception as e:
-        print(f"Ошибка при получении температуры воздуха: {e}")
-        return "Не удалось получить температуру воздуха в данный момент."
+# Дайджест новостей для подписчиков: готовится один раз и рассылается пачками
+news_digest = NewsDigest(send=send_digest_message)
 
 def report_system_time():
     """
@@ -101,6 +76,10 @@ def execute_allowed_command(command):
     """
     Выполнение системной команды, если она разрешена.
     """
+    # Модули нужны только этому намерению, поэтому загружаются при первом вызове
+    import shlex
+    import subprocess
+
     try:
         cmd_parts = shlex.split(command)
         cmd = cmd_parts[0]
@@ -113,50 +92,205 @@ def execute_allowed_command(command):
     except Exception as e:
         return f"Неожиданная ошибка: {e}"
 
-def generate_response(user_input, data):
+_openai_client = None
+_openai_client_lock = threading.Lock()
+
+def get_openai_client():
     """
-    Генерация ответа с использованием OpenAI GPT.
+    Общий клиент OpenAI: создается при первом обращении и переиспользуется
+    (модуль openai загружается только тогда же).
     """
-    try:
-        openai.api_key = OPENAI_API_KEY
-        prompt = f"""Ты — полезный ассистент с информацией о городе Пафос. Используй как свои общие знания, так и следующие данные для ответа пользователю.
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                from openai import OpenAI
+                _openai_client = OpenAI(api_key=OPENAI_API_KEY, timeout=upstreams['openai'].timeout)
+    return _openai_client
+
+def build_prompt(user_input, context):
+    """
+    Формирование запроса к LLM с релевантными фрагментами базы знаний.
+    """
+    data = "\n".join(f"- {chunk}" for chunk in context)
+    return f"""Ты — полезный ассистент с информацией о городе Пафос. Используй как свои общие знания, так и следующие данные для ответа пользователю.
 
 Данные:
-{json.dumps(data, ensure_ascii=False)}
+{data}
 
 Запрос пользователя: {user_input}
 
 Ответ:"""
 
-        response = openai.Completion.create(
-            engine="gpt-4o-mini",
-            prompt=prompt,
-            max_tokens=500,
-            n=1,
-            stop=None,
-            temperature=0.7,
-        )
-        return response.choices[0].text.strip()
+def generate_response(user_input, context):
+    """
+    Генерация ответа с использованием OpenAI GPT.
+
+    :param user_input: Вопрос пользователя.
+    :param context: Фрагменты базы знаний для запроса.
+    """
+    try:
+        return _get_completion(get_openai_client(), build_prompt(user_input, context)).strip()
+    except Exception as e:
+        print(f"Ошибка при генерации ответа: {e}")
+        return GENERATION_FAILED_TEXT
+
+def generate_response_stream(user_input, context, reply):
+    """
+    Потоковая генерация ответа: текст показывается пользователю по мере поступления.
+
+    :param reply: StreamingReply, в который передаются фрагменты ответа.
+    """
+    try:
+        for delta in _stream_completion(get_openai_client(), build_prompt(user_input, context)):
+            reply.push(delta)
+        return reply.text.strip() or GENERATION_FAILED_TEXT
     except Exception as e:
         print(f"Ошибка при генерации ответа: {e}")
-        return "Извините, не удалось обработать ваш запрос в данный момент."
+        return GENERATION_FAILED_TEXT
+
+def rejected_text(error):
+    """
+    Ответ пользователю, если тяжелая задача не принята планировщиком.
+    """
+    if isinstance(error, RateLimited):
+        return f"Слишком много запросов подряд. Попробуйте снова через {math.ceil(error.retry_after)} с."
+    return "Бот сейчас перегружен, попробуйте чуть позже."
+
+def submit_general_question(user_input, reply=None, user_id=None, on_queued=None):
+    """
+    Ответ на общий вопрос о Пафосе: сначала из кэша ответов, иначе через LLM.
+    Генерация ставится в планировщик тяжелых задач; результат — Future, ожидание
+    которого в fan_out не занимает поток, поэтому очередь LLM не задерживает
+    поиск и новости других пользователей.
+
+    :param reply: StreamingReply для потокового показа ответа (необязательно).
+    :param user_id: Пользователь, на чей лимит записывается генерация.
+    :param on_queued: Функция, вызываемая с позицией, если задача попала в очередь.
+    :return: Future с текстом ответа.
+    """
+    future = Future()
+    llm_response = response_cache.get(user_input)
+    if llm_response is not None:
+        future.set_result(llm_response)
+        return future
+
+    with track_stage('knowledge_base'):
+        context = knowledge_base.search(user_input)
+    if reply is not None:
+        generate = lambda: generate_response_stream(user_input, context, reply)
+    else:
+        generate = lambda: generate_response(user_input, context)
+    try:
+        job = job_scheduler.submit(user_id, generate)
+    except JobRejected as e:
+        future.set_result(rejected_text(e))
+        return future
+    if job.position and on_queued is not None:
+        on_queued(job.position)
+
+    def cache_response(done):
+        # Ответ кэшируется, даже если он пришел уже после дедлайна
+        if not done.cancelled() and done.exception() is None and done.result() != GENERATION_FAILED_TEXT:
+            response_cache.set(user_input, done.result())
+
+    job.future.add_done_callback(cache_response)
+    return job.future
+
+def with_city(text_for_search):
+    """
+    Добавление города к поисковому запросу, если он еще не указан.
+    """
+    return text_for_search if "пафос" in text_for_search.lower() else text_for_search + " Пафос"
+
+def format_news(latest_news):
+    return "Вот последние новости из Пафоса:\n" + "\n".join(latest_news)
+
+def format_news_since(new_news):
+    return "Новое в Пафосе с вашего прошлого запроса:\n" + "\n".join(new_news)
+
+def subscribe_news(chat_id):
+    """
+    Подписка чата на дайджест новостей.
+    """
+    if news_subscribers.add(chat_id):
+        return "Вы подписались на дайджест новостей Пафоса. Отписаться: 'отписаться от новостей'."
+    return "Вы уже подписаны на дайджест новостей."
+
+def unsubscribe_news(chat_id):
+    """
+    Отписка чата от дайджеста новостей.
+    """
+    if news_subscribers.remove(chat_id):
+        return "Вы отписались от дайджеста новостей."
+    return "Вы не были подписаны на дайджест новостей."
+
+def format_search_summary(search_sum_results):
+    if search_sum_results:
+        links = "\n".join(search_sum_results["links"])
+        summary = search_sum_results["summary"]
+        return f"Вот краткое резюме найденных статей:\n{summary}\n\nВот некоторые полезные ссылки:\n{links}"
+    return "Не удалось найти информацию по вашему запросу."
+
+def format_search_links(search_links):
+    return f"Вот некоторые полезные ссылки:\n" + "\n".join(search_links)
+
+def format_general(llm_response, search_links, latest_news):
+    # Источники, не успевшие к дедлайну, приходят пустыми — их разделы пропускаются
+    response = llm_response
+    if search_links:
+        response += "\n\nВот некоторые полезные ссылки:\n" + "\n".join(search_links)
+    if latest_news:
+        response += "\n\nТакже последние новости из Пафоса:\n" + "\n".join(latest_news)
+    return response
+
+def queued_notifier(message, reply=None):
+    """
+    Сообщает пользователю позицию его запроса в очереди.
+    """
+    def notify(position):
+        text = QUEUED_TEXT.format(position=position)
+        if reply is not None:
+            reply.status(text)
+        else:
+            with track_upstream('telegram'):
+                bot.reply_to(message, text)
+    return notify
+
+def summarize_search(query):
+    """
+    Задача планировщика: поиск с суммаризацией.
+    """
+    with track_stage('search_and_summarize'):
+        search_sum_results = search_and_summarize(with_city(query), BING_API_KEY, get_openai_client())
+    return format_search_summary(search_sum_results)
+
+def general_llm_response(results, reply=None):
+    """
+    Ответ LLM из результатов fan-out; если генерация не успела, отдается уже показанная часть.
+    """
+    partial = reply.text.strip() if reply is not None else ''
+    return results['llm'] or partial or GENERATION_FAILED_TEXT
+
+WELCOME_TEXT = (
+    "Добро пожаловать в Информационного Бота по городy Пафос!\n"
+    "Вы можете задать мне вопросы о Пафосе, и я постараюсь помочь.\n"
+    "Доступные команды:\n"
+    "- 'время' или 'date': получить текущее системное время\n"
+    "- 'температура моря' или 'sea temperature': получить температуру морской воды\n"
+    "- 'температура воздуха' или 'air temperature': получить температуру воздуха\n"
+    "- 'новости' или 'news': получить последние новости из Пафоса\n"
+    "- 'что нового' или 'what's new': новости с вашего прошлого запроса\n"
+    "- 'подписаться на новости' или 'subscribe news': получать дайджест новостей ('отписаться от новостей' — отменить)\n"
+    "- 'найди [запрос]' или 'search [query]': выполнить поиск в интернете\n"
+    "- 'найди и саммаризуй [запрос]' или 'search and summarize [query]': выполнить поиск и суммаризацию\n"
+    "- 'выполни команду [команда]': выполнить разрешенную системную команду\n"
+    "- 'exit': завершить беседу с ботом\n"
+)
 
 @bot.message_handler(commands=['start', 'help'])
 def send_welcome(message):
-    welcome_text = (
-        "Добро пожаловать в Информационного Бота по городy Пафос!\n"
-        "Вы можете задать мне вопросы о Пафосе, и я постараюсь помочь.\n"
-        "Доступные команды:\n"
-        "- 'время' или 'date': получить текущее системное время\n"
-        "- 'температура моря' или 'sea temperature': получить температуру морской воды\n"
-        "- 'температура воздуха' или 'air temperature': получить температуру воздуха\n"
-        "- 'новости' или 'news': получить последние новости из Пафоса\n"
-        "- 'найди [запрос]' или 'search [query]': выполнить поиск в интернете\n"
-        "- 'найди и саммаризуй [запрос]' или 'search and summarize [query]': выполнить поиск и суммаризацию\n"
-        "- 'выполни команду [команда]': выполнить разрешенную системную команду\n"
-        "- 'exit': завершить беседу с ботом\n"
-    )
-    bot.reply_to(message, welcome_text)
+    bot.reply_to(message, WELCOME_TEXT)
 
 @bot.message_handler(func=lambda message: True)
 def handle_message(message):
@@ -164,78 +298,98 @@ def handle_message(message):
     user_input = message.text.strip().lower()
     log_user_action(logger, user_id, action_description=f"got user message: {user_input}")
 
-    if user_input == 'exit':
-        log_user_action(logger, user_id, action_description="handling user message: exit")
-        bot.reply_to(message, "До свидания!")
-        return
-
-    elif 'время' in user_input or "date" in user_input or "datetime" in user_input:
-        log_user_action(logger, user_id, action_description="handling user message: time")
-        response = report_system_time()
-
-    elif ('температура' in user_input and ('моря' in user_input or 'воды' in user_input)) \
-        or ('temperature' in user_input and ('sea' in user_input or 'water' in user_input)):
-        log_user_action(logger, user_id, action_description="handling user message: sea temperature")
-        response = get_sea_water_temperature()
-
-    elif ('температура' in user_input and ('воздуха' in user_input or 'улице' in user_input)) \
-        or ('temperature' in user_input and ('air' in user_input or 'outside' in user_input)):
-        log_user_action(logger, user_id, action_description="handling user message: air temperature")
-        response = get_air_temperature()
-
-    elif 'выполни команду' in user_input or 'execute' in user_input:
-        log_user_action(logger, user_id, action_description="handling user message: execute command")
-        command = user_input.replace('выполни команду', '').replace('execute', '').strip()
-        response = execute_allowed_command(command)
-
-    elif 'новости' in user_input or 'news' in user_input:
-        print("User asked for news.")
-        latest_news = fetch_latest_news(user_id=user_id, user_progress=user_news_progress)
-        log_user_action(logger, user_id, action_description="handling user message: news")
-        # print(f"Latest news: {latest_news}")
-        response = "Вот последние новости из Пафоса:\n" + "\n".join(latest_news)
-
-    elif "найди и саммаризуй" in user_input or "search and summarize" in user_input:
-        log_user_action(logger, user_id, action_description="handling user message: search and summarize")
-        text_for_search = user_input.replace('найди и саммаризуй', '').replace('search and summarize', '').strip()
-        text_for_search = text_for_search if "Пафос" in text_for_search else text_for_search + " Пафос" 
-        client = OpenAI()
-        search_sum_results = search_and_summarize(text_for_search, BING_API_KEY, client)
-        if search_sum_results:
-            links = "\n".join(search_sum_results["links"])
-            summary = search_sum_results["summary"]
-            response = f"Вот краткое резюме найденных статей:\n{summary}\n\nВот некоторые полезные ссылки:\n{links}"
-        else:
-            response = "Не удалось найти информацию по вашему запросу."
-    
-    elif 'найди' in user_input or 'поищи' in user_input or 'search' in user_input:
-        log_user_action(logger, user_id, action_description="handling user message: search")
-        text_for_search = user_input.replace('найди', '').replace('поищи', '').replace('search', '').strip()
-        text_for_search = text_for_search if "Пафос" in text_for_search else text_for_search + " Пафос" 
-        search_links = perform_internet_search(text_for_search, BING_API_KEY)
-        response = f"Вот некоторые полезные ссылки:\n" + "\n".join(search_links)
+    intent, argument = intent_router.route(user_input)
+    log_user_action(logger, user_id, action_description=f"handling user message: {intent}")
+    reply = None
+    with track_handler(intent):
+        if intent == 'exit':
+            with track_upstream('telegram'):
+                bot.reply_to(message, "До свидания!")
+            return
 
-    else:
-        log_user_action(logger, user_id, action_description="handling user message: general")
-        # Общий запрос о Пафосе
-        data = load_data('data.json')
-        llm_response = generate_response(message.text, data)
+        elif intent == 'time':
+            response = report_system_time()
+
+        elif intent == 'sea temperature':
+            response = get_sea_water_temperature(WEATHER_API_KEY)
 
-        # Выполнение интернет-поиска
-        search_links = perform_internet_search(message.text + " Пафос")
+        elif intent == 'air temperature':
+            response = get_air_temperature(WEATHER_API_KEY)
 
-        # Составление окончательного ответа
-        response = f"{llm_response}\n\nВот некоторые полезные ссылки:\n" + "\n".join(search_links) + \
-                   "\n\nТакже последние новости из Пафоса:\n" + "\n".join(latest_news)
+        elif intent == 'execute command':
+            response = execute_allowed_command(argument)
 
-    log_user_action(logger, user_id, action_description="responding to user: " + response)
-    bot.reply_to(message, response)
+        elif intent == 'news':
+            latest_news = fetch_latest_news(user_id=user_id)
+            response = format_news(latest_news)
+
+        elif intent == 'news since last read':
+            response = format_news_since(fetch_news_since(user_id=user_id))
+
+        elif intent == 'news subscribe':
+            response = subscribe_news(message.chat.id)
+
+        elif intent == 'news unsubscribe':
+            response = unsubscribe_news(message.chat.id)
+
+        elif intent == 'search and summarize':
+            # Выполняется в потоках планировщика, а ответ отправляется отсюда,
+            # чтобы сообщения одного чата получали ответы по порядку
+            try:
+                job = job_scheduler.submit(user_id, lambda: summarize_search(argument))
+            except JobRejected as e:
+                response = rejected_text(e)
+            else:
+                if job.position:
+                    queued_notifier(message)(job.position)
+                try:
+                    response = job.result()
+                except Exception:
+                    response = format_search_summary(None)
+
+        elif intent == 'search':
+            text_for_search = with_city(argument)
+            search_links = perform_internet_search(text_for_search, BING_API_KEY)
+            response = format_search_links(search_links)
+
+        else:
+            # Общий запрос о Пафосе
+            if STREAM_REPLIES:
+                reply = StreamingReply(bot, message)
+                reply.start()
+            # LLM, поиск и новости запрашиваются одновременно, каждый со своим дедлайном;
+            # LLM выполняется в планировщике задач, fan_out только ждет ее результат
+            llm_future = submit_general_question(message.text, reply, user_id, queued_notifier(message, reply))
+            results = fan_out([
+                Source('llm', llm_future, GENERAL_LLM_DEADLINE),
+                Source('search', lambda: perform_internet_search(with_city(message.text), BING_API_KEY), GENERAL_SEARCH_DEADLINE, []),
+                # Первая страница новостей, не сдвигая пагинацию пользователя
+                Source('news', lambda: fetch_latest_news(user_id=user_id, advance=False), GENERAL_NEWS_DEADLINE, []),
+            ])
+            llm_response = general_llm_response(results, reply)
+            if reply is not None and reply.time_to_first_token is not None:
+                TIME_TO_FIRST_TOKEN.observe(reply.time_to_first_token)
+                log_user_action(logger, user_id, action_description=f"time to first token: {reply.time_to_first_token:.2f}s")
+
+            # Составление окончательного ответа
+            response = format_general(llm_response, results['search'], results['news'])
+
+        log_user_action(logger, user_id, action_description="responding to user: " + preview(response))
+        if reply is not None:
+            reply.finish(response)
+        else:
+            with track_upstream('telegram'):
+                bot.reply_to(message, response)
 
 
 
 def main():
     print("Бот запущен и работает...")
     log_user_action(logger, user_id=None, action_description="Bot started and running.")
+    # Новости обновляются в фоне, обработчики читают готовый снимок из памяти
+    news_store.start()
+    news_digest.start()
+    start_metrics_server()
     bot.infinity_polling()
 
 if __name__ == "__main__":
@@ -0,0 +1,161 @@
+import time
+import asyncio
+import threading
+import pytest
+from functions.cache import TTLCache, SQLiteTTLCache
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+    start = threading.Barrier(10)
+
+    def loader():
+        calls.append(1)
+        time.sleep(0.1)
+        return 'value'
+
+    results = []
+
+    def worker():
+        start.wait()
+        results.append(cache.get_or_load('key', loader))
+
+    threads = [threading.Thread(target=worker) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == ['value'] * 10
+
+
+def test_load_error_reaches_waiters_and_is_not_cached():
+    cache = TTLCache(ttl=60)
+    started = threading.Event()
+    errors = []
+
+    def loader():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError('boom')
+
+    def waiter():
+        started.wait()
+        try:
+            cache.get_or_load('key', lambda: 'unused')
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    with pytest.raises(ValueError):
+        cache.get_or_load('key', loader)
+    thread.join()
+
+    assert len(errors) == 1
+    assert cache.get('key') is None
+    assert cache.get_or_load('key', lambda: 'retry') == 'retry'
+
+
+def test_stale_value_is_served_while_refreshing():
+    cache = TTLCache(ttl=0.05, stale_ttl=60)
+    cache.set('key', 'old')
+    time.sleep(0.06)
+    refreshed = threading.Event()
+
+    def loader():
+        refreshed.wait(1)
+        return 'new'
+
+    assert cache.get_or_load('key', loader) == 'old'
+    assert cache.get('key') is None
+    assert cache.get('key', allow_stale=True) == 'old'
+    refreshed.set()
+    assert wait_until(lambda: cache.get('key') == 'new')
+
+
+def test_value_past_stale_window_is_loaded_synchronously():
+    cache = TTLCache(ttl=0.02, stale_ttl=0.02)
+    cache.set('key', 'old')
+    time.sleep(0.05)
+    assert cache.get_or_load('key', lambda: 'new') == 'new'
+
+
+def test_least_recently_used_key_is_evicted():
+    cache = TTLCache(ttl=60, max_size=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_async_concurrent_misses_share_one_load():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'value'
+
+    async def main():
+        return await asyncio.gather(*(cache.aget_or_load('key', loader) for _ in range(10)))
+
+    assert asyncio.run(main()) == ['value'] * 10
+    assert len(calls) == 1
+
+
+def test_sqlite_cache_restores_entries_after_reopening(tmp_path):
+    path = str(tmp_path / 'cache' / 'search.sqlite3')
+    cache = SQLiteTTLCache(path, ttl=60)
+    cache.set('пляжи', [{'name': 'Coral Bay', 'url': 'https://example.com'}])
+    cache.set('музеи', ['park'])
+    cache.delete('музеи')
+    cache.close()
+
+    reopened = SQLiteTTLCache(path, ttl=60)
+    assert reopened.get('пляжи') == [{'name': 'Coral Bay', 'url': 'https://example.com'}]
+    assert reopened.get('музеи') is None
+    reopened.close()
+
+
+def test_sqlite_cache_drops_expired_entries_on_restore(tmp_path):
+    path = str(tmp_path / 'search.sqlite3')
+    cache = SQLiteTTLCache(path, ttl=0.02)
+    cache.set('key', 'value')
+    cache.close()
+    time.sleep(0.05)
+
+    reopened = SQLiteTTLCache(path, ttl=0.02)
+    assert len(reopened) == 0
+    reopened.close()
+
+
+def test_sqlite_cache_keeps_max_size_newest_entries(tmp_path):
+    path = str(tmp_path / 'search.sqlite3')
+    cache = SQLiteTTLCache(path, ttl=60, max_size=2)
+    for key in ('a', 'b', 'c'):
+        cache.set(key, key)
+        time.sleep(0.001)
+    cache.close()
+
+    reopened = SQLiteTTLCache(path, ttl=60, max_size=2)
+    assert reopened.get('a') is None
+    assert (reopened.get('b'), reopened.get('c')) == ('b', 'c')
+    count, = reopened._db.execute("SELECT COUNT(*) FROM entries").fetchone()
+    assert count == 2
+    reopened.close()
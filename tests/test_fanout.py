@@ -0,0 +1,49 @@
+import time
+import asyncio
+from concurrent.futures import Future, ThreadPoolExecutor
+from functions.fanout import Source, fan_out, fan_out_async, FANOUT_WORKERS
+
+
+def test_sources_run_concurrently_and_late_ones_fall_back():
+    started = time.monotonic()
+    results = fan_out([
+        Source('fast', lambda: time.sleep(0.05) or 'fast', 1),
+        Source('slow', lambda: time.sleep(0.5) or 'slow', 0.1, 'fallback'),
+        Source('broken', lambda: 1 / 0, 1, 'fallback'),
+    ])
+    assert results == {'fast': 'fast', 'slow': 'fallback', 'broken': 'fallback'}
+    assert time.monotonic() - started < 0.4
+
+
+def test_pending_futures_do_not_hold_pool_threads():
+    # Больше ожидающих Future, чем потоков fan-out: быстрые источники все равно успевают
+    pending = [Future() for _ in range(FANOUT_WORKERS * 2)]
+
+    def answer(future):
+        return fan_out([Source('llm', future, 0.3), Source('search', lambda: ['link'], 0.25, [])])
+
+    with ThreadPoolExecutor(max_workers=len(pending)) as pool:
+        results = list(pool.map(answer, pending))
+    assert all(result == {'llm': None, 'search': ['link']} for result in results)
+
+
+def test_async_fan_out_cancels_late_tasks():
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def fast():
+        return 'fast'
+
+    async def main():
+        results = await fan_out_async([Source('slow', slow, 0.05, 'fallback'), Source('fast', fast, 1)])
+        await asyncio.sleep(0)
+        return results
+
+    assert asyncio.run(main()) == {'slow': 'fallback', 'fast': 'fast'}
+    assert cancelled == [True]
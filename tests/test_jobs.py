@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import pytest
+from functions.metrics import REGISTRY
+from functions.jobs import TokenBucket, Job, JobScheduler, AsyncJobScheduler, RateLimited, QueueFull, _FairQueue
+
+
+def make_job(user_id):
+    return Job(user_id, None, None)
+
+
+def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=60, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    retry_after = bucket.try_acquire()
+    assert 0 < retry_after <= 1
+
+
+def test_fair_queue_serves_users_round_robin():
+    queue = _FairQueue(max_concurrent=1, max_queued=10, rate=600, burst=10)
+    for user_id in ('a', 'a', 'a', 'b'):
+        queue.push(user_id, make_job(user_id))
+    order = [queue.pop().user_id for _ in range(4)]
+    assert order == ['a', 'b', 'a', 'a']
+    assert queue.pop() is None
+    assert len(queue) == 0
+
+
+def test_fair_queue_position_counts_other_users_once_per_round():
+    queue = _FairQueue(max_concurrent=1, max_queued=10, rate=600, burst=10)
+    jobs = {}
+    for name, user_id in (('a1', 'a'), ('a2', 'a'), ('a3', 'a'), ('b1', 'b')):
+        jobs[name] = make_job(user_id)
+        queue.push(user_id, jobs[name])
+    # Один свободный слот: a1 выполняется сразу; позиция считается при постановке,
+    # поэтому a3 опережает еще не пришедшего b, а b1 обслуживается сразу после a1
+    assert jobs['a1'].position == 0
+    assert jobs['a3'].position == 2
+    assert jobs['b1'].position == 1
+
+
+def test_fair_queue_rejects_over_rate_and_capacity():
+    queue = _FairQueue(max_concurrent=1, max_queued=2, rate=1, burst=1)
+    queue.push('a', make_job('a'))
+    with pytest.raises(RateLimited) as error:
+        queue.push('a', make_job('a'))
+    assert error.value.retry_after > 0
+
+    queue.push('b', make_job('b'))
+    with pytest.raises(QueueFull):
+        queue.push('c', make_job('c'))
+
+
+def test_scheduler_runs_waiting_jobs_fairly():
+    scheduler = JobScheduler(max_concurrent=1, rate=600, burst=10)
+    release = threading.Event()
+    order = []
+
+    blocker = scheduler.submit('a', release.wait)
+    jobs = [scheduler.submit(user_id, lambda user_id=user_id: order.append(user_id)) for user_id in ('a', 'a', 'b')]
+    release.set()
+    blocker.result(timeout=2)
+    for job in jobs:
+        job.result(timeout=2)
+
+    assert order == ['b', 'a', 'a']
+
+
+def test_scheduler_propagates_job_errors():
+    scheduler = JobScheduler(max_concurrent=1, rate=600, burst=10)
+
+    def fail():
+        raise ValueError('boom')
+
+    with pytest.raises(ValueError):
+        scheduler.submit('a', fail).result(timeout=2)
+
+
+def test_async_scheduler_survives_a_new_event_loop():
+    scheduler = AsyncJobScheduler(max_concurrent=2, rate=600, burst=10)
+
+    async def run(value):
+        async def call():
+            await asyncio.sleep(0.01)
+            return value
+        job = await scheduler.submit('a', call)
+        return await asyncio.wait_for(job.future, 2)
+
+    assert asyncio.run(run(1)) == 1
+    # Второй asyncio.run: обработчики первого цикла уже не существуют
+    assert asyncio.run(run(2)) == 2
+
+
+def queued_metric():
+    line, = [line for line in REGISTRY.render().splitlines() if line.startswith('bot_jobs_queued ')]
+    return float(line.split()[1])
+
+
+def test_queued_metric_counts_async_scheduler():
+    scheduler = AsyncJobScheduler(max_concurrent=1, rate=600, burst=10)
+
+    async def main():
+        release = asyncio.Event()
+        before = queued_metric()
+        jobs = [await scheduler.submit(user_id, release.wait) for user_id in ('a', 'b', 'c')]
+        await asyncio.sleep(0.01)
+        queued = queued_metric() - before
+        release.set()
+        await asyncio.gather(*(job.future for job in jobs))
+        await scheduler.close()
+        return queued
+
+    assert asyncio.run(main()) == 2
@@ -0,0 +1,60 @@
+import os
+import json
+from functions.knowledge_base import KnowledgeBase, flatten_data
+
+
+def write_data(path, data):
+    path.write_text(json.dumps(data, ensure_ascii=False), encoding='utf-8')
+
+
+def city_data(beach):
+    return {
+        'beaches': [{'name': beach, 'description': 'sandy beach with blue flag'}],
+        'restaurants': [{'name': f'Taverna {index}', 'cuisine': 'greek meze'} for index in range(20)],
+        'museums': [{'name': 'Archaeological Park', 'description': 'roman mosaics'}],
+    }
+
+
+def test_flatten_keeps_flat_objects_together():
+    assert flatten_data({'beaches': [{'name': 'Coral Bay', 'sand': 'yes'}], 'city': 'Paphos'}) == [
+        'beaches: name: Coral Bay; sand: yes',
+        'city: Paphos',
+    ]
+
+
+def test_search_returns_relevant_top_k(tmp_path):
+    path = tmp_path / 'data.json'
+    write_data(path, city_data('Coral Bay'))
+    kb = KnowledgeBase(str(path), top_k=2, full_context_chars=0)
+
+    chunks = kb.search('best beaches')
+    assert len(chunks) == 1 and 'Coral Bay' in chunks[0]
+    assert len(kb.search('greek taverna')) == 2
+    assert kb.search('mosaics', top_k=5) == ['museums: name: Archaeological Park; description: roman mosaics']
+
+
+def test_small_base_is_returned_whole(tmp_path):
+    path = tmp_path / 'data.json'
+    write_data(path, city_data('Coral Bay'))
+    kb = KnowledgeBase(str(path), top_k=2)
+    assert len(kb.search('beaches')) == len(kb) == 22
+
+
+def test_changed_file_is_reloaded(tmp_path):
+    path = tmp_path / 'data.json'
+    write_data(path, city_data('Coral Bay'))
+    kb = KnowledgeBase(str(path), top_k=2, full_context_chars=0, reload_check_interval=0)
+    assert 'Coral Bay' in kb.search('beach')[0]
+
+    write_data(path, city_data('Lighthouse Beach'))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert 'Lighthouse Beach' in kb.search('beach')[0]
+
+
+def test_unreadable_file_keeps_previous_index(tmp_path):
+    path = tmp_path / 'data.json'
+    write_data(path, city_data('Coral Bay'))
+    kb = KnowledgeBase(str(path), top_k=2, full_context_chars=0, reload_check_interval=0)
+    path.write_text('{broken', encoding='utf-8')
+    assert 'Coral Bay' in kb.search('beach')[0]
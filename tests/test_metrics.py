@@ -0,0 +1,49 @@
+import re
+from functions.metrics import MetricsRegistry, Counter, Gauge, Histogram
+
+SAMPLE = re.compile(r'^[a-zA-Z_:][a-zA-Z0-9_:]*(\{[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\["\\n])*"(?:,[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\["\\n])*")*\})? -?[0-9.e+-]+$')
+
+
+def parse(text):
+    """
+    Разбор текстового формата Prometheus: {имя метрики: тип} и список строк-значений.
+    """
+    assert text.endswith('\n')
+    types, samples = {}, []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            types[name] = kind
+        elif not line.startswith('# HELP '):
+            assert SAMPLE.match(line), line
+            samples.append(line)
+    return types, samples
+
+
+def test_render_is_valid_exposition_format():
+    registry = MetricsRegistry()
+    requests = Counter('test_requests_total', 'Запросы', ['intent'], registry=registry)
+    latency = Histogram('test_seconds', 'Время', ['intent'], buckets=(0.1, 1.0), registry=registry)
+    Gauge('test_queued', 'Очередь', lambda: 3, registry=registry)
+
+    requests.inc(intent='news')
+    requests.inc(2, intent='say "hi"\\\n')
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value, intent='news')
+
+    types, samples = parse(registry.render())
+    assert types == {'test_requests_total': 'counter', 'test_seconds': 'histogram', 'test_queued': 'gauge'}
+    assert 'test_requests_total{intent="news"} 1' in samples
+    assert 'test_requests_total{intent="say \\"hi\\"\\\\\\n"} 2' in samples
+    assert 'test_queued 3.0' in samples
+    # Корзины гистограммы накопительные, +Inf равна количеству наблюдений
+    assert [line.rsplit(' ', 1)[1] for line in samples if line.startswith('test_seconds_bucket')] == ['1', '2', '3']
+    assert 'test_seconds_bucket{intent="news",le="+Inf"} 3' in samples
+    assert 'test_seconds_count{intent="news"} 3' in samples
+
+
+def test_failing_gauge_is_skipped():
+    registry = MetricsRegistry()
+    Gauge('test_broken', 'Ошибка', lambda: 1 / 0, registry=registry)
+    types, samples = parse(registry.render())
+    assert types == {'test_broken': 'gauge'} and samples == []
@@ -0,0 +1,144 @@
+import time
+import pytest
+
+pytest.importorskip('requests')
+
+from functions import news
+from functions.news import NewsStore, fetch_latest_news, fetch_news_since
+from functions.sessions import MemorySessionStore
+from functions.digest import NewsDigest, SubscriberStore
+
+
+class FeedEntry(dict):
+    __getattr__ = dict.__getitem__
+
+
+def feed_entry(number, age):
+    return FeedEntry(
+        title=f"t{number}", link=f"https://example.com/{number}", published_parsed=time.gmtime(time.time() - age),
+    )
+
+
+def make_store(entries, max_entries=100):
+    """
+    Хранилище после первой загрузки ленты из entries.
+    """
+    store = NewsStore(feeds=[], max_entries=max_entries)
+    add(store, entries, first_load=True)
+    store._loaded.set()
+    return store
+
+
+def add(store, entries, first_load=False):
+    store._merge(store._parse_entry(entry, first_load) for entry in entries)
+
+
+def titles(entries):
+    return [entry.title for entry in entries]
+
+
+def test_entries_are_deduplicated_by_link_and_sorted_by_date():
+    store = make_store([feed_entry(1, 300), feed_entry(2, 100), feed_entry(1, 10)])
+    assert titles(store.snapshot()) == ['t2', 't1']
+    assert store.snapshot()[0].text == "**t2**\n[Читать далее](https://example.com/2)\n"
+
+
+def test_since_returns_only_newer_entries():
+    store = make_store([feed_entry(number, 1000 - number * 100) for number in range(5)])
+    border = store.snapshot()[2].published
+    assert titles(store.since(border)) == ['t4', 't3']
+    assert len(store.since(None)) == 5
+
+
+def test_eviction_keeps_both_indexes_consistent():
+    store = make_store([feed_entry(number, 1000 - number) for number in range(5)], max_entries=3)
+    assert titles(store.snapshot()) == ['t4', 't3', 't2']
+    assert sorted(titles(store.added_after(None))) == ['t2', 't3', 't4']
+
+
+def test_injected_empty_stores_are_used(monkeypatch):
+    global_sessions = MemorySessionStore()
+    monkeypatch.setattr(news, 'session_store', global_sessions)
+    sessions = MemorySessionStore()
+    store = make_store([])
+
+    assert fetch_latest_news(1, sessions=sessions, store=store) == ["Больше новостей нет."]
+    assert sessions.get(1, news.NEWS_CURSOR_FIELD) == 5
+    assert len(global_sessions) == 0
+
+
+def test_added_after_includes_late_entries_with_old_dates():
+    store = make_store([feed_entry(1, 100), feed_entry(2, 50)])
+    cursor = store.arrival_cursor(store.added_after(None)[-1])
+    add(store, [feed_entry(3, 100000)])
+    assert titles(store.added_after(cursor)) == ['t3']
+
+
+def test_news_since_pages_through_new_entries():
+    store = make_store([feed_entry(number, 1000 - number) for number in range(3)])
+    sessions = MemorySessionStore()
+    assert fetch_news_since(1, sessions, limit=2, store=store)[0].startswith('**t2**')
+    assert fetch_news_since(1, sessions, limit=2, store=store) == ["Новых новостей нет."]
+
+    add(store, [feed_entry(number, 5) for number in (10, 11, 12)])
+    first = fetch_news_since(1, sessions, limit=2, store=store)
+    assert len(first) == 3 and 'И еще новых новостей: 1' in first[-1]
+    second = fetch_news_since(1, sessions, limit=2, store=store)
+    assert len(second) == 1
+    shown = {line.split('**')[1] for line in first[:2] + second}
+    assert shown == {'t10', 't11', 't12'}
+
+
+def test_digest_uses_injected_stores_and_sends_in_batches(tmp_path):
+    store = make_store([])
+    subscribers = SubscriberStore(str(tmp_path / 'subscribers.sqlite3'))
+    for chat_id in range(5):
+        subscribers.add(chat_id)
+    sent = []
+
+    class Blocked(Exception):
+        error_code = 403
+
+    def send(chat_id, text):
+        if chat_id == 3:
+            raise Blocked()
+        sent.append(chat_id)
+
+    digest = NewsDigest(send, subscribers=subscribers, store=store, interval=3600, batch_size=2, batch_interval=0)
+    assert digest.subscribers is subscribers and digest.store is store
+
+    add(store, [feed_entry(1, 10), feed_entry(2, 5)])
+    assert digest.run_once() == 4
+    assert sorted(sent) == [0, 1, 2, 4]
+    assert 3 not in subscribers
+    # Следующий дайджест — не раньше, чем через interval
+    assert digest.run_once() == 0
+    subscribers.close()
+
+
+def test_feed_failing_at_startup_does_not_flood_whats_new(monkeypatch):
+    store = NewsStore(feeds=['https://a.example/rss', 'https://b.example/rss'])
+    feeds = {
+        'https://a.example/rss': [feed_entry(1, 3600)],
+        'https://b.example/rss': [feed_entry(number, number * 24 * 3600) for number in range(10, 20)],
+    }
+    down = {'https://b.example/rss'}
+
+    def fetch(feed_url, validators):
+        if feed_url in down:
+            raise TimeoutError("нет ответа")
+        return FeedEntry(entries=feeds[feed_url]), {'etag': None, 'modified': None}
+
+    monkeypatch.setattr(store, '_fetch', fetch)
+    store.refresh()
+    cursor = store.arrival_cursor(store.added_after(None)[-1])
+
+    # Лента b загрузилась позже: ее записи за прошлые дни — не новые
+    down.clear()
+    store.refresh()
+    assert len(store) == 11
+    assert store.added_after(cursor) == ()
+
+    feeds['https://b.example/rss'].append(feed_entry(30, 5 * 24 * 3600))
+    store.refresh()
+    assert titles(store.added_after(cursor)) == ['t30']
@@ -0,0 +1,30 @@
+import os
+from functions.response_cache import ResponseCache
+
+
+def test_cache_is_cleared_when_source_file_changes(tmp_path):
+    source = tmp_path / 'data.json'
+    source.write_text('{"beaches": []}', encoding='utf-8')
+    cache = ResponseCache(source_path=str(source))
+    cache.set('Где пляжи?', 'answer')
+    assert cache.get('где  ПЛЯЖИ') == 'answer'
+
+    stat = os.stat(source)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get('где пляжи') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_similar_questions_hit_only_above_threshold():
+    cache = ResponseCache(similarity_threshold=0.8)
+    cache.set('где лучшие пляжи в пафосе', 'beaches')
+    assert cache.get('где лучшие пляжи в пафосе?') == 'beaches'
+    assert cache.get('где самые лучшие пляжи в пафосе') == 'beaches'
+    assert cache.get('где поесть рыбу') is None
+
+
+def test_similarity_is_disabled_by_default():
+    cache = ResponseCache()
+    cache.set('где лучшие пляжи в пафосе', 'beaches')
+    assert cache.get('где самые лучшие пляжи в пафосе') is None
+    assert cache.hits == 0 and cache.misses == 1
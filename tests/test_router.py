@@ -0,0 +1,52 @@
+import pytest
+from functions.router import Intent, IntentRouter, intent_router
+
+
+@pytest.mark.parametrize('text, intent', [
+    ('время', 'time'),
+    ('температура моря сегодня', 'sea temperature'),
+    ('какая температура воздуха', 'air temperature'),
+    ('найди и саммаризуй пляжи', 'search and summarize'),
+    ('найди время работы музея', 'search'),
+    ('новости', 'news'),
+    ('что нового', 'news since last read'),
+    ('подписаться на новости', 'news subscribe'),
+    ('unsubscribe news', 'news unsubscribe'),
+    ('exit', 'exit'),
+    ('где поесть рыбу', 'general'),
+])
+def test_routes_builtin_intents(text, intent):
+    assert intent_router.route(text)[0] == intent
+
+
+def test_argument_has_intent_keywords_stripped():
+    assert intent_router.route('найди музеи пафоса') == ('search', 'музеи пафоса')
+
+
+def test_triggers_match_only_at_word_start():
+    # "date" внутри "update" не должно срабатывать
+    assert intent_router.route('any update on the harbour') == ('general', 'any update on the harbour')
+
+
+def test_multi_word_trigger_needs_all_terms():
+    router = IntentRouter([Intent('sea', priority=1, triggers=[('температура', 'моря')])])
+    assert router.route('температура')[0] == 'general'
+    assert router.route('моря температура')[0] == 'sea'
+
+
+def test_highest_priority_wins_and_exact_matches_whole_text():
+    router = IntentRouter([
+        Intent('low', priority=1, triggers=['погода']),
+        Intent('high', priority=2, triggers=['погода завтра']),
+        Intent('stop', priority=3, exact=['stop']),
+    ])
+    assert router.route('погода завтра')[0] == 'high'
+    assert router.route('погода')[0] == 'low'
+    assert router.route('stop')[0] == 'stop'
+    assert router.route('stop please')[0] == 'general'
+
+
+def test_added_intent_is_routed():
+    router = IntentRouter([Intent('a', priority=1, triggers=['alpha'])])
+    router.add(Intent('b', priority=2, triggers=['beta']))
+    assert router.route('alpha beta')[0] == 'b'
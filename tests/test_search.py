@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip('requests')
+
+from functions.search import ArticleTextExtractor, ARTICLE_TEXT_LIMIT
+
+
+def test_extractor_skips_scripts_and_non_paragraph_text():
+    extractor = ArticleTextExtractor()
+    extractor.feed("<html><head><script>var p = '<p>нет</p>';</script><style>p { }</style></head>")
+    extractor.feed("<body><h1>Заголовок</h1><p>Первый   абзац</p><div>меню</div><p>Второй &amp; <b>последний</b>")
+    extractor.close()
+    assert extractor.get_text() == "Первый абзац Второй & последний"
+
+
+def test_extractor_stops_once_limit_is_reached():
+    extractor = ArticleTextExtractor()
+    paragraph = f"<p>{'x' * 500}</p>"
+    fed = 0
+    while not extractor.done:
+        extractor.feed(paragraph)
+        fed += 1
+    # 4 абзаца по 500 символов (с разделителями) уже больше лимита в 2000
+    assert fed == 4
+
+    # Текст после набранного лимита не накапливается
+    extractor.feed(paragraph * 10)
+    extractor.close()
+    text = extractor.get_text()
+    assert len(text) == ARTICLE_TEXT_LIMIT + 3 and text.endswith('...')
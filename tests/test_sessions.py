@@ -0,0 +1,100 @@
+import time
+import threading
+import multiprocessing
+from functions.sessions import MemorySessionStore, SQLiteSessionStore, make_session_store
+
+INCREMENTS = 50
+
+
+def increment(store, user_id, times=INCREMENTS):
+    for _ in range(times):
+        store.update(user_id, 'count', lambda value: value + 1, default=0)
+
+
+def increment_in_process(path):
+    store = SQLiteSessionStore(path)
+    increment(store, 1)
+    store.close()
+
+
+def run_threads(*targets):
+    threads = [threading.Thread(target=target) for target in targets]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_memory_store_update_is_atomic():
+    store = MemorySessionStore()
+    run_threads(*[lambda: increment(store, 1)] * 8)
+    assert store.get(1, 'count') == 8 * INCREMENTS
+
+
+def test_memory_store_evicts_by_ttl_and_lru():
+    store = MemorySessionStore(ttl=0.05, max_users=2)
+    store.set(1, 'cursor', 5)
+    store.set(2, 'cursor', 5)
+    store.get(1, 'cursor')
+    store.set(3, 'cursor', 5)
+    assert store.get(2, 'cursor') is None
+    assert store.get(1, 'cursor') == 5
+    time.sleep(0.06)
+    assert store.get(1, 'cursor', 'gone') == 'gone'
+
+
+def test_memory_store_delete():
+    store = MemorySessionStore()
+    store.set(1, 'a', 1)
+    store.set(1, 'b', 2)
+    store.delete(1, 'a')
+    assert (store.get(1, 'a'), store.get(1, 'b')) == (None, 2)
+    store.delete(1)
+    assert store.get(1, 'b') is None and len(store) == 0
+
+
+def test_sqlite_stores_sharing_a_file_do_not_lose_writes(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    first, second = SQLiteSessionStore(path), SQLiteSessionStore(path)
+    run_threads(*[lambda: increment(first, 1)] * 4, *[lambda: increment(second, 1)] * 4)
+    assert first.get(1, 'count') == second.get(1, 'count') == 8 * INCREMENTS
+    first.close()
+    second.close()
+
+
+def test_sqlite_update_is_atomic_across_processes(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    store = SQLiteSessionStore(path)
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=increment_in_process, args=(path,)) for _ in range(3)]
+    for process in processes:
+        process.start()
+    increment(store, 1)
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+    assert store.get(1, 'count') == 4 * INCREMENTS
+    store.close()
+
+
+def test_sqlite_store_keeps_json_values_and_expires_by_ttl(tmp_path):
+    path = str(tmp_path / 'sessions.sqlite3')
+    store = SQLiteSessionStore(path, ttl=0.05)
+    store.set('42', 'cursor', [1700000000.5, 'key'])
+    store.set('42', 'digest', {'sent': True})
+    store.delete('42', 'digest')
+    assert store.get(42, 'cursor') == [1700000000.5, 'key']
+    assert store.get(42, 'digest') is None
+    time.sleep(0.06)
+    assert store.get(42, 'cursor') is None
+    store.close()
+
+    # Устаревшие записи удаляются при открытии хранилища
+    reopened = SQLiteSessionStore(path, ttl=0.05)
+    count, = reopened._db.execute("SELECT COUNT(*) FROM sessions").fetchone()
+    assert count == 0
+    reopened.close()
+
+
+def test_unknown_store_kind_falls_back_to_memory():
+    assert isinstance(make_session_store('redis'), MemorySessionStore)
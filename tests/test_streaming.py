@@ -0,0 +1,74 @@
+import time
+import asyncio
+import threading
+from types import SimpleNamespace
+from functions.streaming import StreamingReply, AsyncStreamingReply
+
+MESSAGE = SimpleNamespace(chat=SimpleNamespace(id=1))
+SENT = SimpleNamespace(chat=SimpleNamespace(id=1), message_id=1)
+
+
+class FakeBot:
+    def __init__(self):
+        self.shown = None
+
+    def reply_to(self, message, text):
+        self.shown = text
+        return SENT
+
+    def edit_message_text(self, text, chat_id, message_id):
+        time.sleep(0.005)
+        self.shown = text
+
+    def send_message(self, chat_id, text):
+        pass
+
+
+class AsyncFakeBot(FakeBot):
+    async def reply_to(self, message, text):
+        self.shown = text
+        return SENT
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        await asyncio.sleep(0.002)
+        self.shown = text
+
+
+def test_late_tokens_do_not_overwrite_final_reply():
+    bot = FakeBot()
+    reply = StreamingReply(bot, MESSAGE, min_interval=0)
+    reply.start()
+    producer = threading.Thread(target=lambda: [reply.push('x') for _ in range(50)])
+    producer.start()
+    time.sleep(0.02)
+    reply.finish('final')
+    producer.join()
+    assert bot.shown == 'final'
+
+
+def test_status_is_ignored_after_finish():
+    bot = FakeBot()
+    reply = StreamingReply(bot, MESSAGE, min_interval=0)
+    reply.finish('final')
+    reply.status('queued')
+    assert bot.shown == 'final'
+
+
+def test_async_late_tokens_do_not_overwrite_final_reply():
+    bot = AsyncFakeBot()
+
+    async def main():
+        reply = AsyncStreamingReply(bot, MESSAGE, min_interval=0)
+        await reply.start()
+
+        async def produce():
+            for _ in range(50):
+                await reply.push('x')
+
+        producer = asyncio.create_task(produce())
+        await asyncio.sleep(0.02)
+        await reply.finish('final')
+        await producer
+
+    asyncio.run(main())
+    assert bot.shown == 'final'
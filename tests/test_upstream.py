@@ -0,0 +1,117 @@
+import time
+import pytest
+
+pytest.importorskip('requests')
+
+from functions.upstream import CircuitBreaker, RetryBudget, Upstream, UpstreamUnavailable, is_retryable
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (HTTPError(500), True),
+    (HTTPError(503), True),
+    (HTTPError(429), True),
+    (HTTPError(404), False),
+    (ConnectionResetError(), True),
+    (TimeoutError(), True),
+    (ValueError(), False),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+    breaker.before_call()
+    breaker.after_call(True)
+    assert breaker.state == 'closed'
+    breaker.before_call()
+    breaker.after_call(True)
+    assert breaker.state == 'open'
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+
+def test_success_resets_failure_count():
+    breaker = CircuitBreaker('test', failure_threshold=2, reset_timeout=60)
+    breaker.after_call(True)
+    breaker.after_call(False)
+    breaker.after_call(True)
+    assert breaker.state == 'closed'
+
+
+def test_half_open_allows_one_trial():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    breaker.after_call(True)
+    time.sleep(0.06)
+    assert breaker.state == 'half-open'
+    breaker.before_call()
+    with pytest.raises(UpstreamUnavailable):
+        breaker.before_call()
+
+    breaker.after_call(False)
+    assert breaker.state == 'closed'
+
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    breaker.after_call(True)
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.after_call(True)
+    assert breaker.state == 'open'
+
+
+def test_interrupted_trial_is_not_counted():
+    breaker = CircuitBreaker('test', failure_threshold=1, reset_timeout=0.05)
+    breaker.after_call(True)
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.after_call(None)
+    # Пробный запрос снова разрешен
+    breaker.before_call()
+
+
+def test_retry_budget_limits_retries():
+    budget = RetryBudget(ratio=0.5, max_tokens=1)
+    assert budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw()
+
+
+def test_call_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr(Upstream, '_backoff', staticmethod(lambda attempt: 0))
+    upstream = Upstream('test-retry', timeout=1, retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise HTTPError(503)
+        return 'ok'
+
+    assert upstream.call(flaky) == 'ok'
+    assert len(attempts) == 3
+
+
+def test_call_does_not_retry_client_errors(monkeypatch):
+    monkeypatch.setattr(Upstream, '_backoff', staticmethod(lambda attempt: 0))
+    upstream = Upstream('test-client-error', timeout=1, retries=2)
+    attempts = []
+
+    def bad_request():
+        attempts.append(1)
+        raise HTTPError(400)
+
+    with pytest.raises(HTTPError):
+        upstream.call(bad_request)
+    assert len(attempts) == 1
+    # Ошибка запроса не размыкает предохранитель
+    assert upstream.breaker.failures == 0
@@ -0,0 +1,69 @@
+import json
+import queue
+import threading
+import urllib.request
+import urllib.error
+import pytest
+
+pytest.importorskip('dotenv')
+
+from webhook_bot import update_chat_id, _shard, WebhookHandler, WebhookServer, WEBHOOK_PATH
+
+
+@pytest.mark.parametrize('update, chat_id', [
+    ({'update_id': 1, 'message': {'chat': {'id': 10}}}, 10),
+    ({'update_id': 2, 'edited_message': {'chat': {'id': -20}}}, -20),
+    ({'update_id': 3, 'callback_query': {'from': {'id': 7}, 'message': {'chat': {'id': 30}}}}, 30),
+    ({'update_id': 4, 'inline_query': {'from': {'id': 40}}}, 40),
+    ({'update_id': 5, 'poll': {}}, 5),
+])
+def test_update_chat_id(update, chat_id):
+    assert update_chat_id(update) == chat_id
+
+
+def test_same_chat_always_goes_to_same_shard():
+    assert len({_shard(12345, 4) for _ in range(10)}) == 1
+    assert {_shard(chat_id, 4) for chat_id in range(100)} == {0, 1, 2, 3}
+
+
+@pytest.fixture
+def receiver():
+    queues = [queue.Queue() for _ in range(3)]
+    handler = type('Handler', (WebhookHandler,), {'worker_queues': queues})
+    server = WebhookServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}", queues
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body, method='POST')
+    try:
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def test_updates_of_one_chat_are_queued_in_order_for_one_worker(receiver):
+    url, queues = receiver
+    for update_id in range(20):
+        update = {'update_id': update_id, 'message': {'chat': {'id': update_id % 4}}}
+        assert post(url + WEBHOOK_PATH, json.dumps(update).encode()) == 200
+
+    by_chat = {}
+    for index, worker_queue in enumerate(queues):
+        while not worker_queue.empty():
+            update = json.loads(worker_queue.get_nowait())
+            by_chat.setdefault(update['message']['chat']['id'], []).append((index, update['update_id']))
+    for chat_id, received in by_chat.items():
+        assert {index for index, _ in received} == {_shard(chat_id, len(queues))}
+        assert [update_id for _, update_id in received] == list(range(chat_id, 20, 4))
+
+
+def test_bad_requests_are_rejected(receiver):
+    url, queues = receiver
+    assert post(url + '/other', b'{}') == 404
+    assert post(url + WEBHOOK_PATH, b'not json') == 400
+    assert all(worker_queue.empty() for worker_queue in queues)
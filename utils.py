@@ -1,26 +1,37 @@
 # utils.py
 
 import os
+import queue
+import atexit
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+
+LOG_PREVIEW_LENGTH = 200
 
 def setup_logger():
     """
     Sets up the logger to log user interactions into logs/bot.log.
     Creates the logs directory if it doesn't exist.
-    
+
+    Records are put into an in-memory queue and written to the file by a
+    background listener thread, so handlers never block on disk I/O.
+
     :return: Configured logger instance.
     """
     logs_dir = 'logs'
     if not os.path.exists(logs_dir):
         os.makedirs(logs_dir)
-    
+
     logger = logging.getLogger('paphos_bot_logger')
     logger.setLevel(logging.INFO)
-    
+
+    # Avoid adding multiple handlers if logger already has handlers
+    if logger.handlers:
+        return logger
+
     # Define log format
     formatter = logging.Formatter('%(asctime)s - userid %(user_id)s - %(action)s')
-    
+
     # Create a rotating file handler
     file_handler = RotatingFileHandler(
         os.path.join(logs_dir, 'bot.log'),
@@ -29,19 +40,34 @@ def setup_logger():
         encoding='utf-8'
     )
     file_handler.setFormatter(formatter)
-    
-    # Avoid adding multiple handlers if logger already has handlers
-    if not logger.handlers:
-        logger.addHandler(file_handler)
-    
+
+    # The file handler runs in the listener thread, request threads only enqueue records
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, file_handler)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(QueueHandler(log_queue))
+
     return logger
 
 def log_user_action(logger, user_id, action_description):
     """
     Logs the user's action in a structured format.
-    
+
     :param logger: Logger instance.
     :param user_id: Telegram user ID.
     :param action_description: Description of the action performed by the user.
     """
     logger.info('', extra={'user_id': user_id, 'action': action_description})
+
+def preview(text, limit=LOG_PREVIEW_LENGTH):
+    """
+    Shortens a long text (e.g. a bot response) for logging.
+
+    :param text: Text to shorten.
+    :param limit: Maximum number of characters to keep.
+    :return: The text itself or its beginning with the total length.
+    """
+    if len(text) <= limit:
+        return text
+    return f"{text[:limit]}... ({len(text)} chars)"
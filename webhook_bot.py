@@ -0,0 +1,208 @@
+import os
+import json
+import queue
+import signal
+import threading
+import multiprocessing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from dotenv import load_dotenv
+
+load_dotenv()
+
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 8443))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+# Публичный адрес, который регистрируется в Telegram (setWebhook); пусто — не регистрировать
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+# Секрет из заголовка X-Telegram-Bot-Api-Secret-Token; пусто — не проверять
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', os.cpu_count() or 2))  # процессов-обработчиков
+WEBHOOK_WORKER_THREADS = int(os.getenv('WEBHOOK_WORKER_THREADS', 8))  # потоков в каждом процессе
+WEBHOOK_QUEUE_SIZE = int(os.getenv('WEBHOOK_QUEUE_SIZE', 1000))  # обновлений в очереди одного процесса
+# Очередь входящих соединений: Telegram открывает до 40 соединений одновременно, по умолчанию в сервере — 5
+WEBHOOK_BACKLOG = int(os.getenv('WEBHOOK_BACKLOG', 128))
+
+
+def update_chat_id(update):
+    """
+    Идентификатор чата, к которому относится обновление Telegram.
+    Обновления без чата распределяются по update_id.
+    """
+    for key in ('message', 'edited_message', 'channel_post', 'edited_channel_post'):
+        if key in update:
+            return update[key]['chat']['id']
+    if 'callback_query' in update and 'message' in update['callback_query']:
+        return update['callback_query']['message']['chat']['id']
+    for key in ('inline_query', 'chosen_inline_result', 'callback_query'):
+        if key in update:
+            return update[key]['from']['id']
+    return update.get('update_id', 0)
+
+
+def _shard(chat_id, shards):
+    # Все обновления одного чата попадают в одну очередь и обрабатываются по порядку
+    return hash(chat_id) % shards
+
+
+def worker_main(index, updates):
+    """
+    Процесс-обработчик: выполняет обработчики paphos_bot для обновлений из своей очереди.
+
+    Внутри процесса обновления снова распределяются по чатам между потоками,
+    поэтому сообщения одного чата обрабатываются строго последовательно.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import telebot
+    from functions.news import news_store
+    from functions.metrics import start_metrics_server, METRICS_PORT
+    import paphos_bot
+
+    # Порядок обеспечивается очередями чатов, поэтому обработчики вызываются в текущем потоке
+    paphos_bot.bot.threaded = False
+    news_store.start()
+    # Дайджест запускается в каждом процессе, отправляет тот, кто первым отметит рассылку в общей базе
+    paphos_bot.news_digest.start()
+    if METRICS_PORT:
+        start_metrics_server(port=METRICS_PORT + index)
+
+    def run(chat_updates):
+        while True:
+            raw_update = chat_updates.get()
+            if raw_update is None:
+                return
+            try:
+                update = telebot.types.Update.de_json(raw_update)
+                paphos_bot.bot.process_new_updates([update])
+            except Exception as e:
+                print(f"Ошибка при обработке обновления в процессе {index}: {e}")
+
+    chat_queues = [queue.Queue() for _ in range(WEBHOOK_WORKER_THREADS)]
+    threads = [
+        threading.Thread(target=run, args=(chat_queue,), name=f'webhook-{index}-{number}', daemon=True)
+        for number, chat_queue in enumerate(chat_queues)
+    ]
+    for thread in threads:
+        thread.start()
+
+    while True:
+        raw_update = updates.get()
+        if raw_update is None:
+            break
+        chat_queues[_shard(update_chat_id(json.loads(raw_update)), len(chat_queues))].put(raw_update)
+
+    # Дорабатываем уже принятые обновления и выходим
+    for chat_queue in chat_queues:
+        chat_queue.put(None)
+    for thread in threads:
+        thread.join()
+    paphos_bot.news_digest.stop()
+    news_store.stop()
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Прием обновлений Telegram: обновление сразу ставится в очередь процесса
+    своего чата, ответ 200 отправляется не дожидаясь обработки.
+    """
+
+    worker_queues = []
+
+    def do_POST(self):
+        if self.path.split('?')[0] != WEBHOOK_PATH:
+            self._respond(404)
+            return
+        if WEBHOOK_SECRET and self.headers.get('X-Telegram-Bot-Api-Secret-Token') != WEBHOOK_SECRET:
+            self._respond(403)
+            return
+
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        try:
+            update = json.loads(body)
+            chat_id = update_chat_id(update)
+        except (ValueError, KeyError, TypeError):
+            self._respond(400)
+            return
+
+        try:
+            self.worker_queues[_shard(chat_id, len(self.worker_queues))].put_nowait(body.decode('utf-8'))
+        except queue.Full:
+            # Telegram повторит доставку позже
+            self._respond(503)
+            return
+        self._respond(200)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    HTTP-сервер приемника с очередью соединений WEBHOOK_BACKLOG.
+    """
+
+    request_queue_size = WEBHOOK_BACKLOG
+    daemon_threads = True
+
+
+def register_webhook():
+    """
+    Регистрирует WEBHOOK_URL в Telegram.
+
+    Bot API вызывается напрямую: закрепленная версия pytelegrambotapi
+    не поддерживает secret_token в set_webhook.
+
+    :raises RuntimeError: Если Telegram отклонил запрос.
+    """
+    import requests
+
+    api_url = os.getenv('TELEGRAM_API_URL') or 'https://api.telegram.org/bot{0}/{1}'
+    params = {'url': WEBHOOK_URL}
+    if WEBHOOK_SECRET:
+        params['secret_token'] = WEBHOOK_SECRET
+    response = requests.post(api_url.format(os.getenv('TELEGRAM_TOKEN'), 'setWebhook'), data=params, timeout=30)
+    result = response.json()
+    if not result.get('ok'):
+        raise RuntimeError(f"Telegram отклонил setWebhook: {result.get('description')}")
+
+
+def main():
+    # До запуска процессов: при ошибке регистрации не остается работающих обработчиков
+    if WEBHOOK_URL:
+        register_webhook()
+
+    context = multiprocessing.get_context('spawn')
+    worker_queues = [context.Queue(maxsize=WEBHOOK_QUEUE_SIZE) for _ in range(WEBHOOK_WORKERS)]
+    workers = [
+        context.Process(target=worker_main, args=(index, worker_queue), name=f'webhook-worker-{index}')
+        for index, worker_queue in enumerate(worker_queues)
+    ]
+    for worker in workers:
+        worker.start()
+
+    server = None
+    try:
+        handler = type('ConfiguredWebhookHandler', (WebhookHandler,), {'worker_queues': worker_queues})
+        server = WebhookServer((WEBHOOK_HOST, WEBHOOK_PORT), handler)
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+        print(f"Бот принимает обновления на http://{WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH} ({WEBHOOK_WORKERS} процессов)...")
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Процессы-обработчики не демоны: останавливаем их при любом выходе, в том числе при ошибке запуска сервера
+        if server is not None:
+            server.server_close()
+        for worker_queue in worker_queues:
+            worker_queue.put(None)
+        for worker in workers:
+            worker.join(timeout=30)
+
+
+if __name__ == "__main__":
+    main()